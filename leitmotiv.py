@@ -1,235 +1,616 @@
 import sys
 import lark
 import ast
-import random
-from subprocess import run
+import operator
 import os
-import shutil
+import io
+import json
+import traceback
+import contextlib
+import socketserver
+import hashlib
+from collections import OrderedDict
+from copy import deepcopy
 from ltv_builtins import Reference
 import ltv_builtins
+import ltv_render
+import ltv_literals
+
+# number of results each memo function keeps
+memo_size = 256
+
+# binary operators, resolved once when the tree is compiled
+ops = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "//": operator.floordiv,
+    "%": operator.mod,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "and": lambda x, y: x and y,
+    "or": lambda x, y: x or y,
+}
+
+def direct_assignments(trees, blocks=False):
+    """names of the variables assigned by statements, without the ones assigned in their functions and, unless blocks is
+    set, in their blocks"""
+    names = []
+    stack = list(reversed(trees))
+    while stack:
+        tree = stack.pop()
+        if not isinstance(tree, lark.Tree) or tree.data in ("fn_def", "memo_fn_def") or (tree.data == "block" and not blocks):
+            continue
+        if tree.data == "assignation" and tree.children[0].data == "var":
+            names.append(tree.children[0].children[0].value)
+        stack.extend(reversed(tree.children))
+    return names
+
+class Unassigned:
+    """the value of the slots of a frame until the variable is assigned, reading such a variable reads the one it hides
+    in the enclosing scopes (a function can do a = a + 1 with a global a)"""
+
+class Frame:
+    """the values of the variables of a scope, the resolver gives each variable a slot in the frame of the scope that
+    owns it"""
+    __slots__ = ("values", "parent")
+    def __init__(self, values, parent):
+        self.values = values
+        self.parent = parent
+
+class Scope:
+    """what the resolver knows about a block or a function body while it is compiled"""
+    def __init__(self, parent, names, is_function=False):
+        self.parent = parent
+        self.is_function = is_function
+        self.slots = {name: slot for slot, name in enumerate(names)}
+        self.hides = set()
 
 class LTVFunc:
-    def __init__(self, tokens, arguments, interpreter):
-        self.block = tokens
-        self.arg_list = [argument.identifier for argument in arguments]
+    # a function value only holds references, defining one in a loop costs the same whatever the size of the program
+    __slots__ = ("block", "arg_list", "initial", "interpreter", "frame")
+    def __init__(self, block, arg_list, initial, interpreter):
+        self.block = block
+        self.arg_list = arg_list
+        self.initial = initial
         self.interpreter = interpreter
-        contexts = list(filter(lambda x: x is ltv_builtins.global_scope, self.interpreter.context))
-        self.closure_context = {ident: ctx[ident] for ctx in contexts for ident in ctx}
-
-    def __call__(self, *args, **kwargs):
-        # adds the arguments to the context then interpret the block
-        argument_context = {self.arg_list[i]: arg for i, arg in enumerate(args)}
-        return self.interpreter.eval_block(self.block, additionnal_ctx={**argument_context, **self.closure_context})
+        # the frame of the scope the function was defined in, the global variables are read when the function runs
+        self.frame = interpreter.frame
+
+    def __call__(self, *args):
+        if len(args) > len(self.arg_list):
+            raise Exception(f"function of {len(self.arg_list)} arguments called with {len(args)}")
+        interpreter = self.interpreter
+        saved_frame = interpreter.frame
+        if self.initial:
+            # the arguments are the first slots of the frame
+            interpreter.frame = Frame([*args, *self.initial[len(args):]], self.frame)
+        else:
+            interpreter.frame = self.frame
+        try:
+            last_value = None
+            for instruction in self.block:
+                last_value = instruction()
+            return last_value
+        finally:
+            interpreter.frame = saved_frame
+
+    def __deepcopy__(self, memo):
+        # functions are never modified, copying the values that hold one doesn't need to copy the interpreter
+        return self
+
+class MemoFunc(LTVFunc):
+    """a function that remembers the results of its last memo_size calls. the key of a call is made from the values of
+    its arguments, the calls with an argument that has no key (a function for example) aren't cached"""
+    __slots__ = ("cache", "hits", "misses")
+    def __init__(self, block, arg_list, initial, interpreter):
+        super().__init__(block, arg_list, initial, interpreter)
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, *args):
+        key = ltv_builtins.memo_key(args)
+        if key is None:
+            return super().__call__(*args)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            # the caller may modify the value it gets, the cached one stays intact
+            return ltv_builtins.memo_copy(self.cache[key])
+        self.misses += 1
+        value = super().__call__(*args)
+        self.cache[key] = ltv_builtins.memo_copy(value)
+        if len(self.cache) > memo_size:
+            self.cache.popitem(last=False)
+        return value
 
 class LTVInterpreter:
-    def __init__(self):
+    def __init__(self, render_pool_size=None):
         self.program_lines = None
-        self.context = None
-        self.context_level = None
+        # global variables by name, the other variables are in frames
+        self.globals = None
+        self.frame = None
+        # the resolver state while compiling
+        self.scope = None
+        self.global_names = set()
         self.grammar = open(__file__.split(".py")[0]+".lark", "r").read()
-        self.parser = lark.Lark(self.grammar, propagate_positions=True)
-        self.artifact_folder = "tmp_artifacts"
-
-    def eval_block(self, tokens, additionnal_ctx=None):
-        # removes the "{" and "}" tokens
-        if additionnal_ctx is None:
-            additionnal_ctx = {}
-        self.context.append(additionnal_ctx)
-        tokens = tokens.children[1:-1]
-        self.context_level +=1
-        last_value = None
-        for tok in tokens:
-            last_value = self.get_terminal_value(tok)
-        self.context.pop()
-        self.context_level -=1
-        return last_value.value
-
-    def find_in_context(self, ident):
-        ref = Reference(identifier=ident)
-        current_ctx = self.context_level
-        while current_ctx >= 0:
-            if ident in self.context[current_ctx]:
-                ref.value = self.context[current_ctx][ident]
-                ref.origin_context = current_ctx
-                return ref
-            current_ctx -=1
-        return ref
-
-    def get_terminal_value(self, tokens):
+        # lark keeps the analysed grammar in a cache file (named by a hash of the grammar) so this is only slow once
+        self.parser = lark.Lark(self.grammar, parser="lalr", propagate_positions=True, cache=True)
+        self.fname = None
+        self.images = []
+        self.displays = []
+        # the displayed patterns are rendered in the background while the program is evaluated
+        self.render_pool = ltv_render.RenderPool(render_pool_size)
+        self.render_failures = []
+        # statement caches of the incrementally evaluated programs, by file name
+        self.statement_caches = {}
+
+    def eval_block(self, block, initial):
+        # block is the list of compiled instructions of a block, a block that owns variables gets a new frame
+        if not initial:
+            last_value = None
+            for instruction in block:
+                last_value = instruction()
+            return last_value
+        parent = self.frame
+        self.frame = Frame(list(initial), parent)
+        try:
+            last_value = None
+            for instruction in block:
+                last_value = instruction()
+            return last_value
+        finally:
+            self.frame = parent
+
+    def compile_block(self, tokens, arg_names=None):
+        """compiles the instructions of a block (or of a function body when arg_names is given) in a new scope, returns them
+        with the initial values of the slots of the frame they need"""
+        if arg_names is not None:
+            # a function owns every variable its body assigns, the blocks in it included
+            names = direct_assignments(tokens.children, blocks=True)
+            scope = Scope(self.scope, dict.fromkeys(arg_names + names), is_function=True)
+        else:
+            # an assignment to a variable an enclosing scope owns changes that variable
+            names = direct_assignments(tokens.children)
+            scope = Scope(self.scope, [name for name in dict.fromkeys(names) if not self.is_owned(self.scope, name)])
+        # the variables that exist outside the scope start as the value they hide
+        scope.hides = {name for name in scope.slots
+                       if name in self.global_names or self.resolve(name, self.scope) is not None}
+        initial = tuple(Unassigned if name in scope.hides else None for name in scope.slots)
+        enclosing_scope = self.scope
+        self.scope = scope
+        try:
+            # removes the "{" and "}" tokens
+            block = [self.compile(tok) for tok in tokens.children[1:-1]]
+        finally:
+            self.scope = enclosing_scope
+        return block, initial
+
+    def is_owned(self, scope, name):
+        """whether a scope or an enclosing one, up to the function they are in, owns a variable"""
+        while scope is not None:
+            if name in scope.slots:
+                return True
+            if scope.is_function:
+                return False
+            scope = scope.parent
+        return name in self.global_names
+
+    def resolve(self, name, scope=None, depth=0):
+        """the (depth, slot, scope) of a variable, depth being the number of frames to go up from the current one and scope
+        the one that owns it, or None for a global variable. only the scopes that own variables have a frame. the search
+        can start from another scope than the current one, depth frames above the current one"""
+        scope = self.scope if scope is None else scope
+        while scope is not None:
+            if name in scope.slots:
+                return depth, scope.slots[name], scope
+            if len(scope.slots) > 0:
+                depth += 1
+            scope = scope.parent
+        return None
+
+    def compile_read(self, ident, scope=None, depth=0):
+        resolved = self.resolve(ident, scope, depth)
+        if resolved is None:
+            return lambda: self.globals.get(ident)
+        depth, slot, owner = resolved
+        if depth == 0:
+            get = lambda: self.frame.values[slot]
+        elif depth == 1:
+            get = lambda: self.frame.parent.values[slot]
+        else:
+            def get():
+                frame = self.frame
+                for i in range(depth):
+                    frame = frame.parent
+                return frame.values[slot]
+        if ident not in owner.hides:
+            return get
+        # what the variable is until it's assigned in its scope
+        hidden = self.compile_read(ident, owner.parent, depth + 1) if owner.parent is not None else \
+            (lambda: self.globals.get(ident))
+        def read():
+            value = get()
+            return hidden() if value is Unassigned else value
+        return read
+
+    def compile_write(self, ident):
+        """a function that assigns its argument to a variable"""
+        resolved = self.resolve(ident)
+        if resolved is None:
+            def write_global(value):
+                self.globals[ident] = value
+            return write_global
+        depth, slot, owner = resolved
+        if depth == 0:
+            def write(value):
+                self.frame.values[slot] = value
+            return write
+        def write(value):
+            frame = self.frame
+            for i in range(depth):
+                frame = frame.parent
+            frame.values[slot] = value
+        return write
+
+    def compile(self, tokens):
+        """turns a parse tree node into a closure that evaluates it, literals and operators are resolved here once"""
 
         if type(tokens) == lark.lexer.Token:
-            return self.find_in_context(tokens.value)
-        if tokens.data == "getattr":
-            source = self.get_terminal_value(tokens.children[0]).value
-            attr = self.get_terminal_value(tokens.children[1]).identifier
+            return self.compile_read(tokens.value)
 
-            return Reference(value=source.scope[attr])
+        if tokens.data == "getattr":
+            source = self.compile(tokens.children[0])
+            attr = tokens.children[1].value
+            return lambda: source().scope[attr]
 
         elif tokens.data == "assignation":
-            l_value = self.get_terminal_value(tokens.children[0])
-            r_value = self.get_terminal_value(tokens.children[1])
-            ctx_level = self.context_level if l_value.origin_context is None else l_value.origin_context
-            self.context[ctx_level][l_value.identifier] = r_value.value
-            return r_value
+            if tokens.children[0].data != "var":
+                raise Exception(f"cannot assign to {tokens.children[0].data}")
+            write = self.compile_write(tokens.children[0].children[0].value)
+            r_value = self.compile(tokens.children[1])
+            def assignation():
+                value = r_value()
+                write(value)
+                return value
+            return assignation
 
         elif tokens.data == "display":
-            pattern = self.get_terminal_value(tokens.children[0])
-            img_name = pattern.value.generate_image()
-            if self.program_lines is None:
+            pattern = self.compile(tokens.children[0])
+            line = tokens.meta.end_line-1
+            has_path = len(tokens.children) > 1
+            def display():
+                tune = pattern().tune()
+                self.displays.append((line, has_path, tune))
+                self.write_image_line(line, has_path, self.request_image(tune))
                 return None
-            if len(tokens.children) > 1:
-                self.program_lines[tokens.end_line-1] = self.program_lines[tokens.end_line-1].split(" ")[0] + f" {img_name}"
-            else:
-                self.program_lines[tokens.end_line-1] = self.program_lines[tokens.end_line-1] + f" {img_name}"
-            return None
+            return display
 
         elif tokens.data == "var":
-            return self.find_in_context(tokens.children[0].value)
+            return self.compile(tokens.children[0])
 
         elif tokens.data == "not_test":
-            negated = not self.get_terminal_value(tokens.children[-1]).value
-            return Reference(value=negated)
+            operand = self.compile(tokens.children[-1])
+            return lambda: not operand()
 
         elif tokens.data in {"term", "arith_expr", "comparison", "and_test", "or_test"}:
-            result = self.get_terminal_value(tokens.children[0]).value
-            ops = {
-                "+":lambda x, y: x+y,
-                "-": lambda x, y: x-y,
-                "*":lambda x,y: x*y,
-                "/": lambda x,y: x/y,
-                "//": lambda x,y: x//y,
-                "/": lambda x,y: x/y,
-                "%": lambda x,y: x%y,
-                "<": lambda x,y: x<y,
-                "<=": lambda x,y: x<=y,
-                ">": lambda x,y: x>y,
-                ">=": lambda x,y: x>=y,
-                "==": lambda x,y: x==y,
-                "!=": lambda x,y: x!=y,
-                "and": lambda x,y: x and y,
-                "or": lambda x,y: x or y,
-            }
-
+            first = self.compile(tokens.children[0])
+            rest = []
             for i in range(1, len(tokens.children), 2):
-                # because of parsing priority stuff, integer division has to be a rule and so is a Tree object
-                op = tokens.children[i]
-                if type(op) == lark.Tree:
-                    op = op.children[0].value
-                else:
-                    op = op.value
-                operand = self.get_terminal_value(tokens.children[i+1]).value
-                result = ops[op](result, operand)
-            return Reference(value = result)
-
+                rest.append((ops[tokens.children[i].value], self.compile(tokens.children[i+1])))
+            if len(rest) == 1:
+                op, operand = rest[0]
+                return lambda: op(first(), operand())
+            def operation():
+                result = first()
+                for op, operand in rest:
+                    result = op(result, operand())
+                return result
+            return operation
 
         elif tokens.data == "abc_def":
-            return Reference(value=ltv_builtins.Pattern(ast.literal_eval(tokens.children[0].value)))
+            abcstring = ast.literal_eval(tokens.children[0].value)
+            return lambda: ltv_builtins.literal(abcstring)
 
         elif tokens.data == "perc1_def":
-            return Reference(value=ltv_builtins.Pattern(ast.literal_eval(tokens.children[0].value), header="perc1"))
+            abcstring = ast.literal_eval(tokens.children[0].value)
+            return lambda: ltv_builtins.literal(abcstring, header="perc1")
 
         elif tokens.data == "arguments":
-            return list(filter(None, [self.get_terminal_value(child) for child in tokens.children]))
+            return [self.compile(child) for child in tokens.children]
 
-        elif tokens.data == "fn_def":
-            args = self.get_terminal_value(tokens.children[0])
-            instructions = tokens.children[1]
-            return Reference(value=LTVFunc(instructions, args, self))
+        elif tokens.data in ("fn_def", "memo_fn_def"):
+            args = [] if tokens.children[0] is None else self.compile_arg_names(tokens.children[0])
+            block, initial = self.compile_block(tokens.children[1], args)
+            # a function that modifies its values in place can't be memoized
+            if tokens.data == "memo_fn_def" and not any(tokens.children[1].find_data("side_effect_call")):
+                return lambda: MemoFunc(block, args, initial, self)
+            return lambda: LTVFunc(block, args, initial, self)
 
         elif tokens.data == "block":
-            return Reference(self.eval_block(tokens))
+            block, initial = self.compile_block(tokens)
+            return lambda: self.eval_block(block, initial)
 
         elif tokens.data == "if_expr":
+            branches = []
+            else_block = None
             i = 0
             while i < len(tokens.children):
-                # if we are in if or elif, test the next value for truthiness
+                # if we are in if or elif, the next value is the condition of the next block
                 if tokens.children[i].value in ["if", "elif"]:
-                    if self.get_terminal_value(tokens.children[i+1]).value:
-                        # if it is, eval the next block
-                        return Reference(value=self.eval_block(tokens.children[i+2]))
+                    branches.append((self.compile(tokens.children[i+1]), *self.compile_block(tokens.children[i+2])))
                     i+=3
                 else:
-                    # if you are in else, eval the next block
-                    return Reference(value=self.eval_block(tokens.children[i+1]))
+                    else_block = self.compile_block(tokens.children[i+1])
+                    break
+            def if_expr():
+                for condition, block, initial in branches:
+                    if condition():
+                        return self.eval_block(block, initial)
+                if else_block is not None:
+                    return self.eval_block(*else_block)
+                return None
+            return if_expr
 
         elif tokens.data == "list":
-            list_items = self.get_terminal_value(tokens.children[0])
-            return Reference(value=ltv_builtins.LTVList(list_items))
+            items = [] if tokens.children[0] is None else self.compile(tokens.children[0])
+            return lambda: ltv_builtins.LTVList([Reference(value=item()) for item in items])
+
         elif tokens.data == "list_access":
-            lst = self.get_terminal_value(tokens.children[0]).value
-            idx = self.get_terminal_value(tokens.children[1]).value
-            return lst[idx]
+            lst = self.compile(tokens.children[0])
+            idx = self.compile(tokens.children[1])
+            return lambda: lst()[idx()].value
 
         elif tokens.data == "while_expr":
-
-            last_val = None
-            while self.get_terminal_value(tokens.children[0]).value:
-                last_val = self.eval_block(tokens.children[1])
-            return Reference(value=last_val)
+            condition = self.compile(tokens.children[0])
+            block, initial = self.compile_block(tokens.children[1])
+            def while_expr():
+                last_val = None
+                while condition():
+                    last_val = self.eval_block(block, initial)
+                return last_val
+            return while_expr
 
         elif tokens.data == "func_call":
-            function = self.get_terminal_value(tokens.children[0]).value
-            arguments = [arg.value for arg in self.get_terminal_value(tokens.children[1])]
-
-            return Reference(value=function(*arguments))
+            function = self.compile(tokens.children[0])
+            arguments = [] if tokens.children[1] is None else self.compile(tokens.children[1])
+            return lambda: function()(*[arg() for arg in arguments])
 
         elif tokens.data == "side_effect_call":
-
             # get the source object
-            source = self.get_terminal_value(tokens.children[0]).value
+            source = self.compile(tokens.children[0])
             # gets the identifier of the attr
-            attr = self.get_terminal_value(tokens.children[2]).identifier
-            # source->attr
-            func = source.scope[attr]
-            # calls the function with all its passed arguments and the side_effect=True flag
-            return Reference(value=lambda *arg, **kwargs: func(side_effect=True, *arg, **kwargs))
+            attr = tokens.children[2].value
+            def side_effect_call():
+                # source->attr
+                func = source().scope[attr]
+                # calls the function with all its passed arguments and the side_effect=True flag
+                return lambda *arg, **kwargs: func(side_effect=True, *arg, **kwargs)
+            return side_effect_call
 
         elif tokens.data == "number":
             if tokens.children[0].type == "DEC_NUMBER":
-                return Reference(value=int(tokens.children[0].value))
+                value = int(tokens.children[0].value)
             else:
-                return Reference(value=float(tokens.children[0].value))
+                value = float(tokens.children[0].value)
+            return lambda: value
 
         elif tokens.data == "factor":
-            return Reference(value=-self.get_terminal_value(tokens.children[1]).value)
+            operand = self.compile(tokens.children[1])
+            return lambda: -operand()
 
         elif tokens.data == "string":
-            return Reference(value=ast.literal_eval(tokens.children[0].value))
-
-        elif tokens.data == "molecule":
-            """this is weird and patchy"""
-            return None
-
-
-    def evaluate_file(self, fname):
+            value = ast.literal_eval(tokens.children[0].value)
+            return lambda: value
+
+    def request_image(self, tune):
+        """the path of the image of a tune, the image itself is made in the background"""
+        return self.render_pool.submit(*tune)
+
+    def write_image_line(self, line, has_path, img_name):
+        self.images.append(img_name)
+        if self.program_lines is None:
+            return
+        if has_path:
+            self.program_lines[line] = self.program_lines[line].split(" ")[0] + f" {img_name}"
+        else:
+            self.program_lines[line] = self.program_lines[line] + f" {img_name}"
+
+    def compile_arg_names(self, tokens):
+        return [child.children[0].value for child in tokens.children if child.data == "var"]
+
+    def evaluate_file(self, fname, incremental=False):
         program = open(fname).read()
-        self.artifact_folder = f"{fname}_artifacts"
-        ltv_builtins.artifact_folder = self.artifact_folder
+        self.fname = fname
         self.program_lines = program.split("\n")
-        self.evaluate_program(program)
-        program = open(fname, "w").write("\n".join(self.program_lines))
-
+        self.evaluate_program(program, incremental)
+        open(fname, "w").write("\n".join(self.program_lines))
+        return self.program_lines, self.images
 
 
-    def evaluate_program(self, program):
-        try:
-            shutil.rmtree(self.artifact_folder)
-        except:
-            pass
-        os.mkdir(self.artifact_folder)
 
+    def evaluate_program(self, program, incremental=False):
+        """evaluates a program, in incremental mode the top level statements that didn't change since the last evaluation
+        (and don't depend on a statement that did) are not executed, their results are restored from the cache"""
         if program[-1] != "\n":
             program += "\n"
         self.parse_tree = self.parser.parse(program)
-        self.context_level = 0
-        self.context = [ltv_builtins.global_scope]
+        # the variables assigned at the top level are global, the blocks that assign them don't get their own
+        self.global_names = set(ltv_builtins.global_scope).union(direct_assignments(self.parse_tree.children))
+        self.scope = None
+        instructions = [self.compile(instruction) for instruction in self.parse_tree.children]
+        # each program gets its own global scope so that a long lived interpreter doesn't leak variables between runs
+        self.globals = dict(ltv_builtins.global_scope)
+        self.frame = None
+        self.images = []
+        self.displays = []
+        try:
+            if incremental:
+                last_value = self.evaluate_incremental(program, instructions)
+            else:
+                last_value = None
+                for instruction in instructions:
+                    last_value = instruction()
+        finally:
+            # a failed render doesn't stop the program, it is reported once everything is rendered
+            self.render_failures = self.render_pool.join()
+        return Reference(value=last_value)
+
+    def evaluate_incremental(self, program, instructions):
+        old_cache = self.statement_caches.get(self.fname, {})
+        new_cache = {}
+        graph = dependency_graph(program, self.parse_tree.children)
+        global_scope = self.globals
         last_value = None
-        for instruction in self.parse_tree.children:
-            last_value = self.get_terminal_value(instruction)
+        for tree, instruction in zip(self.parse_tree.children, instructions):
+            signature, writes, mutated, volatile = graph.pop(0)
+            cached = None if volatile else old_cache.get(signature)
+            if cached is None:
+                self.displays = []
+                last_value = instruction()
+                # the values that a later statement modifies in place are copied so that the cached one stays intact
+                values = {name: snapshot(global_scope[name], name in mutated) for name in writes if name in global_scope}
+                displays = [(line - tree.meta.line, tune) for line, has_path, tune in self.displays]
+                cached = (values, displays, last_value)
+                # a display in the body of a function is on the line of the function, not of the statement calling it,
+                # such a statement runs again every time
+                if volatile or any(not tree.meta.line - 1 <= line < tree.meta.end_line for line, has_path, tune in self.displays):
+                    continue
+            else:
+                values, displays, last_value = cached
+                for name, value in values.items():
+                    global_scope[name] = snapshot(value, name in mutated)
+                # whether the display lines already have an image path depends on the current text
+                has_paths = {node.meta.end_line-1: len(node.children) > 1 for node in tree.find_data("display")}
+                for line, tune in displays:
+                    # the image may have left the cache since, requesting it renders it again if needed
+                    self.write_image_line(tree.meta.line + line, has_paths[tree.meta.line + line], self.request_image(tune))
+            new_cache[signature] = cached
+        self.statement_caches[self.fname] = new_cache
         return last_value
 
 
+def snapshot(value, mutated):
+    return deepcopy(value) if mutated else value
+
+def root_name(tree):
+    """the variable an expression like a[0].b(1) reads its value from, or None"""
+    while tree.data in ("list_access", "getattr", "func_call", "side_effect_call"):
+        tree = tree.children[0]
+    return tree.children[0].value if tree.data == "var" else None
+
+def statement_names(tree, function_writes):
+    """returns the variables a statement reads, the ones it assigns or modifies and the ones it modifies in place"""
+    reads, writes, mutated = set(), set(), set()
+    for node in tree.iter_subtrees():
+        if node.data == "var":
+            reads.add(node.children[0].value)
+        elif node.data == "assignation" and node.children[0].data == "var":
+            writes.add(node.children[0].children[0].value)
+        elif node.data == "side_effect_call" and root_name(node.children[0]) is not None:
+            # x[0]->shift(1) modifies the value of x
+            mutated.add(root_name(node.children[0]))
+        elif node.data == "func_call":
+            function = node.children[0]
+            # a method call like lst.append(x) may modify its source
+            if function.data == "getattr" and root_name(function) is not None:
+                mutated.add(root_name(function))
+            # calling a function does what its body does
+            elif function.data == "var" and function.children[0].value in function_writes:
+                body_reads, body_writes, body_mutates = function_writes[function.children[0].value]
+                reads.update(body_reads)
+                writes.update(body_writes)
+                if body_mutates and node.children[1] is not None:
+                    # the function might modify its arguments
+                    mutated.update(arg.children[0].value for arg in node.children[1].children if arg.data == "var")
+    if tree.data == "assignation" and tree.children[1].data in ("fn_def", "memo_fn_def"):
+        body_reads, body_writes, body_mutated = statement_names(tree.children[1].children[1], function_writes)
+        function_writes[tree.children[0].children[0].value] = (body_reads, body_writes | body_mutated, len(body_mutated) > 0)
+    return reads, writes | mutated, mutated
+
+def dependency_graph(program, statements):
+    """gives each top level statement a signature made from its text and the signatures of the statements that last
+    wrote the variables it reads, so a statement keeps its signature as long as it and everything upstream is unchanged"""
+    last_writers = {}
+    function_writes = {}
+    names = [statement_names(tree, function_writes) for tree in statements]
+    mutated_anywhere = set().union(*[mutated for reads, writes, mutated in names])
+    # the variables that may hold a value modified in place, through another variable too (after b = a, a->shift(1)
+    # changes b). the statements that use them run every time
+    functions = set(ltv_builtins.global_scope).union(function_writes)
+    volatile = set(mutated_anywhere)
+    grown = True
+    while grown:
+        grown = False
+        for reads, writes, mutated in names:
+            names_used = (reads | writes) - functions
+            if writes and names_used & volatile and not names_used <= volatile:
+                volatile.update(names_used)
+                grown = True
+    graph = []
+    for tree, (reads, writes, mutated) in zip(statements, names):
+        # the image path written after a display isn't part of the statement
+        end_pos = tree.children[0].meta.end_pos if tree.data == "display" else tree.meta.end_pos
+        text = program[tree.meta.start_pos:end_pos]
+        upstream = sorted(last_writers.get(name, "") for name in reads)
+        signature = hashlib.sha1("\n".join([text] + upstream).encode("utf-8")).hexdigest()
+        for name in writes:
+            last_writers[name] = signature
+        graph.append((signature, writes, mutated_anywhere, len((reads | writes) & volatile) > 0))
+    return graph
+
+
+default_socket = f"/tmp/leitmotiv-{os.getuid()}.sock"
+
+class LTVRequestHandler(socketserver.StreamRequestHandler):
+    """evaluates the file named in a one line json request and answers with the rewritten lines and the image paths"""
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        output = io.StringIO()
+        response = {}
+        try:
+            with contextlib.redirect_stdout(output):
+                lines, images = self.server.interpreter.evaluate_file(request["file"], incremental=True)
+            response["lines"] = lines
+            response["images"] = images
+            response["render_errors"] = [f"could not render {svg}: {error}" for svg, error in self.server.interpreter.render_failures]
+        except Exception:
+            response["error"] = traceback.format_exc()
+        response["output"] = output.getvalue()
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+def serve(socket_path=default_socket):
+    """keeps an interpreter (and music21, lark and abc2xml) loaded and evaluates files sent by ltv_client.py"""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with socketserver.UnixStreamServer(socket_path, LTVRequestHandler) as server:
+        server.interpreter = LTVInterpreter()
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+
 
 if __name__ == "__main__":
-    interp = LTVInterpreter()
-    interp.evaluate_file(sys.argv[1])
+    args = sys.argv[1:]
+    if args[0] in ("-j", "--jobs"):
+        ltv_render.pool_size = int(args[1])
+        args = args[2:]
+    if args[0] == "--clear-cache":
+        ltv_literals.clear()
+        args = args[1:]
+        if len(args) == 0:
+            sys.exit()
+    if args[0] == "--serve":
+        serve(*args[1:2])
+    else:
+        interp = LTVInterpreter()
+        interp.evaluate_file(args[0])
+        for svg, error in interp.render_failures:
+            print(f"could not render {svg}: {error}", file=sys.stderr)
@@ -0,0 +1,212 @@
+"""parser for the part of abc leitmotiv uses (notes, rests, chords, ties, tuplets, broken rhythms, bar lines, repeats and
+inline [M:] [L:] [K:] fields). it builds the arrays of ltv_notes directly instead of going through abc2xml and the
+musicxml parser of music21, anything else makes it give up so the pattern falls back on abc2xml"""
+import re
+import music21
+from fractions import Fraction
+import ltv_notes
+
+length_re = r"(\d*)(/*)(\d*)"
+note_re = re.compile(r"(\^\^|\^|__|_|=)?([A-Ga-g])([',]*)" + length_re)
+chord_re = re.compile(r"\[((?:(?:\^\^|\^|__|_|=)?[A-Ga-g][',]*[\d/]*)+)\]" + length_re)
+rest_re = re.compile(r"[zx]" + length_re)
+tuplet_re = re.compile(r"\((\d+)(?::(\d*))?(?::(\d*))?")
+field_re = re.compile(r"\[([MLK]):([^\]]*)\]")
+bar_re = re.compile(r"\[\||:*\|[|\]]?:*|::")
+broken_re = re.compile(r"\s*(>+|<+)")
+ignored_re = re.compile(r"[ \t\n`]+|%[^\n]*")
+key_re = re.compile(r"\s*([A-G])([#b]?)\s*(m|min|minor|maj|major)?\s*$", re.IGNORECASE)
+accidentals = {"^^": 2, "^": 1, "=": 0, "_": -1, "__": -2}
+
+class GiveUp(Exception):
+    pass
+
+def length(number, slashes, denominator):
+    if slashes == "":
+        return Fraction(int(number or 1))
+    if denominator != "" and len(slashes) > 1:
+        raise GiveUp()
+    return Fraction(int(number or 1), int(denominator) if denominator != "" else 2**len(slashes))
+
+# the music21 objects of the attributes are never modified (ltv_notes copies them when it builds a stream) so they are
+# shared by every pattern
+attribute_cache = {}
+
+def cached_attribute(fn):
+    def wrapper(text):
+        if (fn, text) not in attribute_cache:
+            attribute_cache[fn, text] = fn(text)
+        return attribute_cache[fn, text]
+    return wrapper
+
+@cached_attribute
+def time_signature(text):
+    text = text.strip()
+    if text == "C":
+        text = "4/4"
+    elif text == "C|":
+        text = "2/2"
+    elif not re.fullmatch(r"\d+/\d+", text):
+        raise GiveUp()
+    return music21.meter.TimeSignature(text)
+
+@cached_attribute
+def key(text):
+    """the music21 key of a K: field and the alteration of each step name in it"""
+    match = key_re.match(text)
+    if not match:
+        raise GiveUp()
+    tonic, accidental, mode = match.groups()
+    mode = "minor" if mode is not None and mode.lower().startswith("m") and mode.lower() not in ("maj", "major") else "major"
+    m21_key = music21.key.Key(tonic + {"#": "#", "b": "-", "": ""}[accidental], mode)
+    return m21_key, {pitch.step: int(pitch.accidental.alter) for pitch in m21_key.alteredPitches}
+
+@cached_attribute
+def bar_attribute(text):
+    if text == "||":
+        return music21.bar.Barline("double")
+    if text == "|]":
+        return music21.bar.Barline("final")
+    if text == "|":
+        return ltv_notes.regular_barline
+    return music21.bar.Repeat(direction=text)
+
+@cached_attribute
+def instrument(part_id):
+    instrument = music21.instrument.Instrument()
+    instrument.partId = part_id
+    return instrument
+
+class ABCParser:
+    def __init__(self, abcstring):
+        self.abc = abcstring
+        self.pos = 0
+        # (duration in quarter notes, has a tie after it, pitches)
+        self.events = []
+        m21_key, self.key_alters = key("C")
+        self.attributes = [(0, instrument("P1")), (0, m21_key), (0, time_signature("4/4"))]
+        self.unit = Fraction(1)
+        self.measure_alters = {}
+        self.tuplet_factor = Fraction(1)
+        self.tuplet_notes = 0
+        self.next_factor = Fraction(1)
+
+    def match(self, regex):
+        match = regex.match(self.abc, self.pos)
+        if match:
+            self.pos = match.end()
+        return match
+
+    def pitch(self, match):
+        accidental, name, octave = match.group(1), match.group(2), match.group(3)
+        step = "CDEFGAB".index(name.upper()) + (29 if name.isupper() else 36)
+        step += 7 * octave.count("'") - 7 * octave.count(",")
+        if accidental is not None:
+            self.measure_alters[step] = accidentals[accidental]
+        elif self.events and self.events[-1][1] and step in self.events[-1][2]:
+            # a tied note keeps the alteration of the note it's tied to
+            return step, self.events[-1][2][step]
+        return step, self.measure_alters.get(step, self.key_alters.get(name.upper(), 0))
+
+    def add_event(self, duration, pitches):
+        if self.tuplet_notes > 0:
+            duration *= self.tuplet_factor
+            self.tuplet_notes -= 1
+        self.events.append([duration * self.unit * self.next_factor, False, dict(pitches)])
+        self.next_factor = Fraction(1)
+        if self.abc.startswith("-", self.pos):
+            self.pos += 1
+            self.events[-1][1] = True
+        broken = self.match(broken_re)
+        if broken:
+            short = Fraction(1, 2**len(broken.group(1)))
+            factors = (2 - short, short) if broken.group(1)[0] == ">" else (short, 2 - short)
+            self.events[-1][0] *= factors[0]
+            self.next_factor = factors[1]
+
+    def bar(self, text):
+        self.measure_alters = {}
+        position = len(self.events)
+        count = len(self.attributes)
+        if text.startswith(":"):
+            self.attributes.append((position, bar_attribute("end")))
+        if text.endswith(":"):
+            self.attributes.append((position, bar_attribute("start")))
+        if text.strip(":") in ("||", "|]"):
+            self.attributes.append((position, bar_attribute(text.strip(":"))))
+        if len(self.attributes) == count:
+            # a measure ends here
+            self.attributes.append((position, bar_attribute("|")))
+        # endings are left to abc2xml
+        if self.pos < len(self.abc) and (self.abc[self.pos].isdigit() or self.abc[self.pos] == "["):
+            raise GiveUp()
+
+    def field(self, name, value):
+        position = len(self.events)
+        if name == "M":
+            self.attributes.append((position, time_signature(value)))
+        elif name == "L":
+            unit = re.fullmatch(r"\s*(\d+)/(\d+)\s*", value)
+            if not unit:
+                raise GiveUp()
+            self.unit = Fraction(int(unit.group(1)) * 4, int(unit.group(2)))
+        else:
+            m21_key, self.key_alters = key(value)
+            self.measure_alters = {}
+            self.attributes.append((position, m21_key))
+
+    def chord(self, match):
+        notes = list(note_re.finditer(match.group(1)))
+        pitches = [self.pitch(note) for note in notes]
+        # the pitches of an event are kept by step, a chord with two notes on the same step is left to abc2xml
+        if len({step for step, alter in pitches}) != len(pitches):
+            raise GiveUp()
+        # the length of the chord is the one of its first note
+        self.add_event(length(*notes[0].group(4, 5, 6)) * length(*match.group(2, 3, 4)), pitches)
+
+    def note(self, match):
+        self.add_event(length(*match.group(4, 5, 6)), [self.pitch(match)])
+
+    def rest(self, match):
+        self.add_event(length(*match.group(1, 2, 3)), [])
+
+    def tuplet(self, match):
+        p = int(match.group(1))
+        if p == 0:
+            raise GiveUp()
+        q = int(match.group(2)) if match.group(2) else (3 if p in (2, 4, 8) else 2)
+        self.tuplet_factor = Fraction(q, p)
+        self.tuplet_notes = int(match.group(3)) if match.group(3) else p
+
+    def parse(self):
+        tokens = [(ignored_re, lambda match: None), (field_re, lambda match: self.field(*match.groups())),
+                  (chord_re, self.chord), (note_re, self.note), (rest_re, self.rest), (tuplet_re, self.tuplet),
+                  (bar_re, lambda match: self.bar(match.group(0)))]
+        while self.pos < len(self.abc):
+            for regex, handler in tokens:
+                match = self.match(regex)
+                if match:
+                    handler(match)
+                    break
+            else:
+                raise GiveUp()
+        return self.notes()
+
+    def notes(self):
+        events = []
+        for i, (duration, tied, pitches) in enumerate(self.events):
+            ticks = duration * ltv_notes.TICKS
+            if ticks.denominator != 1 or ticks <= 0:
+                raise GiveUp()
+            stops = i > 0 and self.events[i-1][1] and any(step in self.events[i-1][2] for step in pitches)
+            tie = {(False, False): ltv_notes.NO_TIE, (True, False): ltv_notes.TIE_START,
+                   (False, True): ltv_notes.TIE_STOP, (True, True): ltv_notes.TIE_CONTINUE}[tied and len(pitches) > 0, stops]
+            events.append((int(ticks), tie, list(pitches.items())))
+        return ltv_notes.NoteArrays([ltv_notes.NotePart.from_events(events, self.attributes)])
+
+def parse(abcstring):
+    """the ltv_notes arrays of an abc string without header, or None if it uses something this parser doesn't know"""
+    try:
+        return ABCParser(abcstring).parse()
+    except GiveUp:
+        return None
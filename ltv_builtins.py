@@ -1,19 +1,42 @@
 import music21
-import random
-from subprocess import run, check_output
+from subprocess import check_output
 import os
 import sys
 import m21_helpers
 import re
 import functools
+import hashlib
+import inspect
+from fractions import Fraction
+from math import gcd
 from copy import deepcopy
-
-artifact_folder = "tmp_artifacts"
+import tempfile
+import ltv_notes
+import ltv_abc
+import ltv_render
+import ltv_literals
+try:
+    import abc2xml
+    import xml2abc
+except ImportError:
+    abc2xml = None
+    xml2abc = None
+
+# patterns are stored in the arrays of ltv_notes when they can be, set to False to always work on music21 streams
+native_backend = True
+# the transformations of patterns are recorded and only run when the notes are needed, set to False to run them right away
+lazy_patterns = True
+converters_folder = os.path.dirname(os.path.abspath(__file__))
 
 # this is a fancy decorator that can act on the class of a method
 class ltv_method:
-    def __init__(self, fn):
+    def __init__(self, fn, lazy=False, fuse=None, check=None):
         self.fn = fn
+        self.lazy = lazy
+        self.fuse = fuse
+        self.check = check
+        # a method that takes the side_effect flag modifies the pattern in place and returns it when it is set
+        self.in_place = "side_effect" in inspect.signature(fn).parameters
 
     def __set_name__(self, owning_class, name):
         # appends the function's name to the list of ltv methods
@@ -25,9 +48,21 @@ class ltv_method:
             if "side_effect" in kwargs:
                 side_effect = kwargs["side_effect"]
                 del(kwargs["side_effect"])
-            # gets the value returned by the function
             method_self = args[0]
+            # a lazy method is only recorded on the pattern, it runs when something needs the notes
+            if self.lazy and lazy_patterns:
+                # the arguments are checked now, the error would otherwise come from the line that needs the notes
+                if self.check is not None:
+                    self.check(*args[1:], **kwargs)
+                pattern = method_self if side_effect else method_self.lazy_copy()
+                pattern.record(self, args[1:], kwargs)
+                return pattern
+            if self.in_place:
+                kwargs["side_effect"] = side_effect
+            # gets the value returned by the function
             value = self.fn(*args, **kwargs)
+            if value is method_self:
+                return value
             # if the value is a music21 Stream, it means we must either modify the instance or create a new one
             if issubclass(type(value), music21.stream.Stream):
                 # if the function was called with side-effects, modifies and returns the existing pattern, else make a new one
@@ -37,16 +72,56 @@ class ltv_method:
                     return method_self
                 else:
                     return Pattern(m21_repr=value, header=args[0].header_type)
+            # same thing with the native representation
+            if type(value) == ltv_notes.NoteArrays:
+                if side_effect:
+                    method_self.set_notes(value)
+                    method_self.dirty_abc = True
+                    return method_self
+                else:
+                    return Pattern(notes=value, header=args[0].header_type)
             return value
         # overwrite with the wrapped function
         setattr(owning_class, name, wrapper)
 
+def lazy_ltv_method(fuse=None, check=None):
+    """an ltv method that returns the notes of a new pattern without reading anything else than the pattern and its
+    arguments, it can run later. fuse(pattern, first_args, second_args) gives the arguments of one call that does the same
+    as two consecutive calls on the pattern, or None when they can't be merged. check(*args) raises when the method would
+    fail with these arguments"""
+    return lambda fn: ltv_method(fn, lazy=True, fuse=fuse, check=check)
+
+def fuse_transposes(pattern, first, second):
+    (first_interval, *first_keep), (second_interval, *second_keep) = first, second
+    if (first_keep or [False]) != (second_keep or [False]):
+        return None
+    # music21 spells the result of a transposition by semitones from the pitch it started from, the arrays only from
+    # the pitch they end on and the key it's in. that key is the one of the second call, which is the one of the merged
+    # call only when the keys are transposed too
+    if type(first_interval) == int and type(second_interval) == int and pattern._notes is not None and \
+            (first_keep or [False])[0]:
+        return (first_interval + second_interval, *first_keep)
+    if type(first_interval) == str and type(second_interval) == str:
+        # named intervals add their steps and their semitones
+        interval = music21.interval.add([first_interval, second_interval])
+        return (interval.directedName, *first_keep)
+    return None
+
+def fuse_shifts(pattern, first, second):
+    return (first[0] + second[0],)
+
+def check_transpose(interval, keep_keys=False):
+    ltv_notes.interval_steps(interval)
+
+def check_shift(shift):
+    if type(shift) != int:
+        raise Exception(f"can't shift by {shift}, it isn't a whole number")
+
 
 class Reference:
     def __init__(self, identifier=None, value=None):
         self.identifier = identifier
         self.value = value
-        self.origin_context = None
     def __repr__(self):
         return f"({self.identifier} -> {self.value})"
     def __eq__(self, other):
@@ -77,21 +152,49 @@ headers = {
     "perc1": {"pre_header":"""%%bgcolor white\n%%beginsvg\n<defs>\n<g id="xhead" class="stroke">\n<line y1="-2.5" y2="2.5" x1="-3.5" x2="3.5" style="stroke-width:0.75"></line>\n<line y1="-2.5" y2="2.5" x1="3.5" x2="-3.5" style="stroke-width:0.75"></line>\n</g>\n</defs>\n%%endsvg\n%%map shape key,C heads=xhead\n%%map shape key,E heads=xhead\n%%map shape key,F heads=xhead\n%%map shape key,G heads=xhead\n%%map shape key,A heads=xhead\n%%map shape key,B heads=xhead\n%%voicemap shape\n""","header":"X:1\nL:1/4\nK:C clef=perc stafflines=1\n"}
 }
 
-def list_index_of_instance(lst, el):
-    for i in range(len(lst)):
-        if lst[i] is el:
-            return i
-    raise Exception("instance not in list")
-
 def lst_shift(seq, n=0):
     # thank you stackoverflow
     a = n % len(seq)
     return seq[-a:] + seq[:-a]
 
+def abc_to_xml(abcstring):
+    """converts an abc tune to a musicxml string, in process when abc2xml can be imported"""
+    if abc2xml is not None:
+        try:
+            xml_strings = abc2xml.getXmlScores(abcstring)
+            if xml_strings:
+                return xml_strings[0]
+        except Exception:
+            pass
+    # falls back on running the script
+    with tempfile.NamedTemporaryFile("w", suffix=".abc") as abcfile:
+        abcfile.write(abcstring)
+        abcfile.flush()
+        return check_output([sys.executable, os.path.join(converters_folder, "abc2xml.py"), abcfile.name]).decode("utf-8")
+
+def xml_to_abc(xml):
+    """converts a musicxml string to abc, in process when xml2abc can be imported"""
+    if xml2abc is not None:
+        try:
+            return xml2abc.getAbcString(xml, ["-d", "4"])
+        except Exception:
+            pass
+    # falls back on running the script
+    with tempfile.NamedTemporaryFile("w", suffix=".xml") as xmlfile:
+        xmlfile.write(xml)
+        xmlfile.flush()
+        return check_output([sys.executable, os.path.join(converters_folder, "xml2abc.py"), "-d", "4", xmlfile.name]).decode("utf-8")
+
 class Pattern(LTVObject):
-    def __init__(self, abcstring=None, m21_repr=None, header="normal"):
-        self.id = random.randrange(0,10000000)
-        self.m21_repr = m21_repr
+    def __init__(self, abcstring=None, m21_repr=None, header="normal", notes=None):
+        # the notes are either in the arrays of ltv_notes (the music21 stream is then only built when it's needed) or in m21_repr
+        self._notes = notes
+        self._m21_repr = m21_repr
+        # the (ltv_method, args, kwargs) of the lazy methods that were called on the pattern and didn't run yet
+        self.operations = []
+        # whether the arrays or the stream were copied for this pattern alone, they are shared until then
+        self.owns_notes = False
+        self.owns_m21 = False
         self.dirty_abc = abcstring is None
         self.musicxml_s = None
         self.abcstring = abcstring
@@ -99,49 +202,220 @@ class Pattern(LTVObject):
         self.pre_header = headers[header]["pre_header"]
         self.header = headers[header]["header"]
         self.svgfile_s = None
-        self.abcfile_s = None
-        if self.abcstring is not None:
-            self.write_abc_artifact()
-        if self.m21_repr is None:
-            # generates the abc file artifact
+        self._fingerprint = None
+        self._metrics = None
+        if self._notes is None and self._m21_repr is None and native_backend:
+            # most literals can be read straight into the arrays
+            self._notes = ltv_abc.parse(self.abcstring)
+            self.dirty_abc = True
+        if self._m21_repr is None and self._notes is None:
             # gets the music21 IR from the abc
-            self.m21_repr = music21.converter.parse(self.get_abc2xml(), format="xml")
-            self.update_abc()
+            self._m21_repr = music21.converter.parse(self.get_abc2xml(), format="xml")
+            # the abc is regenerated from the music21 IR, but only when something needs it
+            self.dirty_abc = True
+        if self._notes is None and native_backend:
+            self._notes = ltv_notes.from_m21(self._m21_repr)
+        if self._notes is not None and header == "perc1":
+            # single line percussion is kept as onset bits on a grid when it can be
+            self._notes = ltv_notes.rhythms(self._notes)
 
         super().__init__()
 
-    @ltv_method
-    def shift(self, shift):
+    @property
+    def notes(self):
+        """the arrays of the pattern, the reader may keep them so the pattern doesn't modify them in place anymore"""
+        self.owns_notes = False
+        return self.current_notes()
+
+    def current_notes(self):
+        """the arrays of the pattern for reading them without keeping them"""
+        if self.operations:
+            self.materialize()
+        return self._notes
+
+    @property
+    def m21_repr(self):
+        if self.operations:
+            self.materialize()
+        if self._m21_repr is None:
+            self._m21_repr = self._notes.to_m21()
+        self.owns_m21 = False
+        return self._m21_repr
+
+    @m21_repr.setter
+    def m21_repr(self, value):
+        self._m21_repr = value
+        self._notes = None
+        self.owns_m21 = False
+        self.changed()
+
+    def set_notes(self, notes):
+        self._notes = notes
+        self._m21_repr = None
+        self.owns_notes = False
+        self.changed()
+
+    def changed(self):
+        """forgets what was computed from the notes"""
+        self.dirty_abc = True
+        self._fingerprint = None
+        self._metrics = None
+
+    def writable_notes(self):
+        """the arrays of the pattern for modifying them in place, they are copied first if another pattern may have them"""
+        notes = self.current_notes()
+        if not self.owns_notes:
+            notes = self._notes = notes.copy()
+            self.owns_notes = True
+        self._m21_repr = None
+        self.changed()
+        return notes
+
+    def writable_m21(self):
+        """the stream of the pattern for modifying it in place, it is copied first if another pattern may have it or its
+        elements"""
+        if self.operations:
+            self.materialize()
+        if self._m21_repr is None:
+            self._m21_repr = self._notes.to_m21()
+        elif not self.owns_m21:
+            self._m21_repr = deepcopy(self._m21_repr)
+        self.owns_m21 = True
+        stream = self._m21_repr
+        self._notes = None
+        self.changed()
+        return stream
+
+    def lazy_copy(self):
+        """a pattern with the same notes and recorded operations, nothing runs"""
+        copy = Pattern(notes=self._notes, m21_repr=self._m21_repr, header=self.header_type)
+        copy.operations = list(self.operations)
+        self.owns_notes = self.owns_m21 = False
+        return copy
+
+    def record(self, method, args, kwargs):
+        last = self.operations[-1] if self.operations else None
+        fused = None
+        if last is not None and last[0] is method and method.fuse is not None and not last[2] and not kwargs:
+            fused = method.fuse(self, last[1], args)
+        if fused is not None:
+            self.operations[-1] = (method, fused, {})
+        else:
+            self.operations.append((method, args, kwargs))
+        self.changed()
+
+    def materialize(self):
+        """runs the recorded operations, in place when the methods can. an operation leaves the queue once it ran, the ones
+        left after an error still run the next time the notes are needed"""
+        # the methods read the notes of the pattern, the queue is put aside so that they don't materialize it again
+        operations, self.operations = self.operations, []
+        for i, (method, args, kwargs) in enumerate(operations):
+            try:
+                if method.in_place:
+                    value = method.fn(self, *args, side_effect=True, **kwargs)
+                else:
+                    value = method.fn(self, *args, **kwargs)
+            except Exception:
+                self.operations = operations[i:]
+                raise
+            if value is self:
+                continue
+            if type(value) == ltv_notes.NoteArrays:
+                self.set_notes(value)
+            else:
+                self.m21_repr = value
+
+    def fingerprint(self):
+        """a digest of the parts, notes, durations, ties and header of the pattern, the same for every pattern with the same
+        music. it is kept until a side effect changes the pattern"""
+        if self._fingerprint is None:
+            notes = self.current_notes()
+            if notes is None:
+                notes = ltv_notes.from_m21(self.m21_repr)
+            content = notes.fingerprint() if notes is not None else self.get_abc()
+            self._fingerprint = hashlib.sha1(f"{self.header_type} {content}".encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+    def metrics(self):
+        """the number of notes and rests of each part, the duration in quarter notes and the lowest and highest midi
+        pitches (None when there are only rests), computed once until a side effect changes the pattern"""
+        if self._metrics is None:
+            notes = self.current_notes()
+            if notes is not None:
+                counts = [part.count_notes() for part in notes.parts]
+                duration = Fraction(max(part.duration() for part in notes.parts), ltv_notes.TICKS)
+                pitches = [ltv_notes.natural_midi(step) + alter
+                           for part in notes.parts for step, alter in zip(part.steps, part.alters)]
+            else:
+                parts = m21_helpers.getParts(self.m21_repr)
+                counts = [len(m21_helpers.findByClass(part, ("Note", "Rest"))) for part in parts]
+                duration = Fraction(max(part.duration.quarterLength for part in parts))
+                pitches = [pitch.midi for pitch in self.m21_repr.flat.pitches]
+            self._metrics = {
+                "counts": counts,
+                "duration": int(duration) if duration.denominator == 1 else float(duration),
+                "range": (min(pitches), max(pitches)) if pitches else (None, None),
+            }
+        return self._metrics
+
+    def __eq__(self, other):
+        return type(other) == Pattern and self.fingerprint() == other.fingerprint()
+
+    def __hash__(self):
+        return hash(self.fingerprint())
+
+    def copy(self):
+        """a pattern with the same notes that can be modified without changing this one. the copy shares the notes or the
+        stream, whichever pattern modifies them in place first copies them"""
+        if self.notes is not None:
+            copy = Pattern(notes=self.notes, header=self.header_type)
+        else:
+            copy = Pattern(m21_repr=self.m21_repr, header=self.header_type)
+        copy.abcstring, copy.dirty_abc = self.abcstring, self.dirty_abc
+        copy._fingerprint = self._fingerprint
+        copy._metrics = self._metrics
+        return copy
+
+    @lazy_ltv_method(fuse_shifts, check_shift)
+    def shift(self, shift, side_effect=False):
         """shift each part by <shift> notes or rests"""
-        stream = self.m21_repr
+        if self.current_notes() is not None:
+            if side_effect:
+                self.writable_notes().shift(shift, in_place=True)
+                return self
+            return self.notes.shift(shift)
+        # the elements of a stream can't be rotated in place without moving every offset, a new stream is built
         new_stream = music21.stream.Stream()
-        for part in stream.parts:
+        for part in m21_helpers.getParts(self.m21_repr):
+            elems_in_part = list(m21_helpers.index(part)[0])
+            notes_idxs = m21_helpers.positionsByClass(part, ("Note", "Rest"))
+            if notes_idxs:
+                shifted_notes = lst_shift([elems_in_part[i] for i in notes_idxs], shift)
+                for i, note in zip(notes_idxs, shifted_notes):
+                    elems_in_part[i] = note
+            # nothing modifies the elements of a pattern in place so the new part can share them with this one
             new_part = music21.stream.Part()
-            elems_in_part = list(part.flat)
-            notes_or_rests = m21_helpers.findByClass(part, ("Note","Rest"))
-            notes_idxs = [list_index_of_instance(elems_in_part, n_o_r) for n_o_r in m21_helpers.findByClass(part, ("Note","Rest"))]
-            shifted_notes = lst_shift(notes_or_rests, shift)
-            current_note_or_rest = 0
-            for i in range(len(elems_in_part)):
-                elem = None
-                if i not in notes_idxs:
-                    elem = deepcopy(elems_in_part[i])
-                else:
-                    elem = deepcopy(shifted_notes[current_note_or_rest])
-                    current_note_or_rest+=1
-                new_part.append(elem)
+            new_part.append(elems_in_part)
             new_stream.append(new_part)
-
         return new_stream
 
     @ltv_method
     def count_notes(self):
-        return max([len(m21_helpers.findByClass(p, ("Note", "Rest"))) for p in m21_helpers.getParts(self.m21_repr)])
-
-
-    @ltv_method
-    def transpose(self, interval, keep_keys=False):
-        transposed = self.m21_repr.transpose(interval)
+        return max(self.metrics()["counts"])
+
+
+    @lazy_ltv_method(fuse_transposes, check_transpose)
+    def transpose(self, interval, keep_keys=False, side_effect=False):
+        if self.current_notes() is not None:
+            if side_effect:
+                self.writable_notes().transpose(interval, keep_keys, in_place=True)
+                return self
+            return self.notes.transpose(interval, keep_keys)
+        if side_effect:
+            transposed = self.writable_m21()
+            transposed.transpose(interval, inPlace=True)
+        else:
+            transposed = self.m21_repr.transpose(interval)
 
         if not keep_keys:
             inversed_interval = music21.interval.Interval(interval).reverse()
@@ -160,63 +434,222 @@ class Pattern(LTVObject):
     def to_xml(self, filename):
         self.m21_repr.write('musicxml', fp=filename)
 
+    @ltv_method
+    def to_abc(self, filename):
+        open(filename, "w").write(self.header + self.get_abc())
 
-    def write_abc_artifact(self):
-        self.abcfile_s = f"{artifact_folder}/{self.id}.abc"
-        open(self.abcfile_s,"w").write(self.pre_header+self.header+self.abcstring)
 
+    def get_abc(self):
+        if self.dirty_abc:
+            self.update_abc()
+        return self.abcstring
 
     def get_abc2xml(self):
-        if self.abcfile_s is None:
-            self.update_abc()
-        abcfile_s = f"{artifact_folder}/{self.id}_noheader.abc"
-        open(abcfile_s,"w").write(headers["normal"]["header"]+ self.abcstring)
-        xml = check_output(["python", __file__.split("ltv_builtins.py")[0]+"abc2xml.py", f"{abcfile_s}"]).decode("utf-8")
-        return xml
+        return abc_to_xml(headers["normal"]["header"]+ self.abcstring)
 
-    def update_abc(self):
-        xml_path = f"{artifact_folder}/{self.id}.xml"
-        self.to_xml(xml_path)
-        abc = check_output(["python", __file__.split("ltv_builtins.py")[0]+"xml2abc.py", "-d 4", f"{xml_path}"]).decode("utf-8")
+    def get_musicxml(self):
+        return music21.musicxml.m21ToXml.GeneralObjectExporter(self.m21_repr).parse().decode("utf-8")
 
-        self.abcstring = "\n".join(filter(lambda line: not re.match("[A-Z]:.*", line), abc.split("\n")))
-        self.write_abc_artifact()
+    def update_abc(self):
+        abc = xml_to_abc(self.get_musicxml())
+        lines = abc.split("\n")
+        # the tune is drawn under the header of the pattern, a key or a meter of the first measure that isn't the one of
+        # the header (C, 4/4) goes at the start of the notes as an inline field
+        fields = "".join(f"[{line.strip()}]" for line in lines if re.match("[KM]:", line) and line[2:].strip() not in ("C", "4/4"))
+        body = [line for line in lines if not re.match("[A-Z]:.*", line)]
+        first = next((i for i, line in enumerate(body) if line.strip() != "" and not line.startswith("%")), None)
+        if fields and first is not None:
+            body[first] = fields + body[first]
+        self.abcstring = "\n".join(body)
+        self.dirty_abc = False
+
+    def tune(self):
+        """the (pre_header, tune) pair that abcm2ps renders"""
+        return self.pre_header, self.header+self.get_abc()
 
     def generate_image(self):
-        if self.svgfile_s is None or self.dirty_abc:
-            self.update_abc()
-        outfile_s = f"{artifact_folder}/{self.id}.svg"
-        run(["abcm2ps", "-g", self.abcfile_s, "-O", outfile_s])
-        # abcm2ps appends 001 to the filename...
-        self.svgfile_s = f"{artifact_folder}/{self.id}001.svg"
+        self.svgfile_s = ltv_render.render(*self.tune())
         return self.svgfile_s
 
+# parsed abc"..." and perc1"..." literals by (header, abc, backend), evaluating a literal again gives a copy of the
+# pattern it was parsed into
+literal_cache = {}
+literal_cache_size = 1024
+# the literals are also kept on disk by ltv_literals between runs
+literal_disk_cache = True
+
+def literal(abcstring, header="normal"):
+    key = (header, abcstring, native_backend)
+    if key not in literal_cache:
+        if len(literal_cache) >= literal_cache_size:
+            # forgets the oldest literal
+            del literal_cache[next(iter(literal_cache))]
+        literal_cache[key] = parse_literal(abcstring, header)
+    return literal_cache[key].copy()
+
+def parse_literal(abcstring, header):
+    use_disk = native_backend and literal_disk_cache
+    content = ltv_literals.load(abcstring, header) if use_disk else None
+    if type(content) == ltv_notes.NoteArrays:
+        return Pattern(notes=content, header=header)
+    if content is not None:
+        return Pattern(m21_repr=content, header=header)
+    pattern = Pattern(abcstring, header=header)
+    if use_disk:
+        try:
+            ltv_literals.store(abcstring, header, pattern.notes, pattern._m21_repr)
+        except Exception:
+            # the literal just won't be cached
+            pass
+    return pattern
 
 def concat(*args):
     """concatenate patterns on top of eachother"""
     if type(args[0]) == LTVList:
         args = [it.value for it in args[0].items]
-    stream = music21.stream.Stream()
+    if all(pattern.notes is not None for pattern in args):
+        return Pattern(notes=ltv_notes.concat([pattern.notes for pattern in args]), header=args[0].header_type)
+    stream = music21.stream.Score()
     parts = [music21.stream.Part() for i in range(max([len(m21_helpers.getParts(pattern.m21_repr)) for pattern in args]))]
     for p in parts:
         stream.append(p)
+    in_parts = [set() for part in parts]
     for pattern in args:
         for i, part in enumerate(m21_helpers.getParts(pattern.m21_repr)):
-            for thing in list(part):
-                parts[i].append(deepcopy(thing))
+            # the elements are shared with the patterns, a stream can't hold the same element twice so only the ones that
+            # are already in the part (a pattern concatenated with itself) are copied
+            elements = [deepcopy(thing) if id(thing) in in_parts[i] else thing for thing in part]
+            in_parts[i].update(id(thing) for thing in elements)
+            parts[i].append(elements)
     return Pattern(m21_repr=stream, header=args[0].header_type)
 
 def stack(*args):
     """stack multiple patterns on top of eachother"""
     if type(args[0]) == LTVList:
         args = [it.value for it in args[0].items]
-    stream = music21.stream.Stream()
+    if all(pattern.notes is not None for pattern in args):
+        return Pattern(notes=ltv_notes.stack([pattern.notes for pattern in args]), header=args[0].header_type)
+    stream = music21.stream.Score()
     for pattern in args:
-        part = music21.stream.Part()
-        part.append(pattern.m21_repr)
-        stream.append(part)
+        # each part of each pattern is a part of the stack, the new parts share their elements with the patterns
+        for part in m21_helpers.getParts(pattern.m21_repr) or [pattern.m21_repr]:
+            new_part = music21.stream.Part()
+            new_part.append(list(part))
+            stream.append(new_part)
 
     return Pattern(m21_repr=stream, header=args[0].header_type)
 
-
-global_scope = {"concat":concat, "stack":stack, "print":print}
+def memo_key(value):
+    """a hashable key made from a value (or a tuple of arguments) for the memo functions, None when the value can't be
+    part of a key"""
+    if value is None or type(value) in (int, float, str, bool):
+        return type(value), value
+    if type(value) in (tuple, LTVList):
+        keys = tuple(memo_key(item) for item in (value if type(value) == tuple else [item.value for item in value.items]))
+        return None if None in keys else (type(value), keys)
+    if type(value) == Pattern:
+        return Pattern, value.fingerprint()
+    return None
+
+def memo_copy(value):
+    """a copy of a value that can be modified in place without changing the original"""
+    if type(value) == Pattern:
+        return value.copy()
+    if type(value) == LTVList:
+        return LTVList([Reference(value=memo_copy(item.value)) for item in value.items])
+    return value
+
+def notes_per_part(pattern):
+    """the number of notes and rests of each part"""
+    return LTVList([Reference(value=count) for count in pattern.metrics()["counts"]])
+
+def count_parts(pattern):
+    return len(pattern.metrics()["counts"])
+
+def duration(pattern):
+    """the length of the longest part in quarter notes"""
+    return pattern.metrics()["duration"]
+
+def pitch_range(pattern):
+    """the midi numbers of the lowest and the highest pitches"""
+    return LTVList([Reference(value=pitch) for pitch in pattern.metrics()["range"]])
+
+def rhythm_notes(pattern):
+    """the arrays of a pattern with a RhythmPart for each part"""
+    notes = pattern.notes if pattern.notes is not None else ltv_notes.from_m21(pattern.m21_repr)
+    if notes is None:
+        raise Exception("rhythm operations only work on patterns without endings")
+    notes = ltv_notes.rhythms(notes)
+    if any(type(part) != ltv_notes.RhythmPart for part in notes.parts):
+        raise Exception("rhythm operations only work on parts without chords, ties or notes of different pitches")
+    return notes
+
+def rhythm_grids(patterns):
+    """for each part index, the numpy grid of the onsets of that part in the patterns (a row per pattern that has it) on
+    the finest grid of these parts, the parts on that grid and the index of the pattern of each row"""
+    all_notes = [rhythm_notes(pattern) for pattern in patterns]
+    grids = []
+    for i in range(max(len(notes.parts) for notes in all_notes)):
+        owners = [j for j, notes in enumerate(all_notes) if i < len(notes.parts)]
+        unit = 0
+        for j in owners:
+            unit = gcd(unit, all_notes[j].parts[i].unit)
+        parts = [all_notes[j].parts[i].on_grid(unit) for j in owners]
+        grids.append((ltv_notes.rhythm_grid(parts), parts, owners))
+    return grids
+
+def combine_rhythms(args, combine):
+    """a rhythm made of the combined onsets of the parts with the same index, an event starts wherever one starts in
+    these parts"""
+    if type(args[0]) == LTVList:
+        args = [it.value for it in args[0].items]
+    parts = []
+    for grid, group, owners in rhythm_grids(args):
+        pitch = next((part.pitch for part in group if part.pitch is not None), ltv_notes.rhythm_pitch)
+        longest = max(group, key=lambda part: part.length)
+        starts = 0
+        for part in group:
+            starts |= part.starts
+        parts.append(ltv_notes.RhythmPart.from_grid(combine(grid), longest.unit, pitch, longest.attributes, starts))
+    return Pattern(notes=ltv_notes.NoteArrays(parts), header="perc1")
+
+def union(*args):
+    """the onsets that are in any of the rhythms"""
+    return combine_rhythms(args, lambda grid: grid.any(axis=0))
+
+def intersection(*args):
+    """the onsets that are in all the rhythms"""
+    return combine_rhythms(args, lambda grid: grid.all(axis=0))
+
+def xor(*args):
+    """the onsets that are in exactly one of the rhythms"""
+    return combine_rhythms(args, lambda grid: grid.sum(axis=0) == 1)
+
+def complement(rhythms):
+    """the rests of a rhythm (or of each rhythm of a list) become notes and its notes rests"""
+    patterns = [it.value for it in rhythms.items] if type(rhythms) == LTVList else [rhythms]
+    complements = []
+    for pattern in patterns:
+        parts = [ltv_notes.RhythmPart(part.starts & ~part.onsets, part.length, part.unit,
+                                      part.pitch or ltv_notes.rhythm_pitch, part.attributes, part.starts)
+                 for part in rhythm_notes(pattern).parts]
+        complements.append(Pattern(notes=ltv_notes.NoteArrays(parts), header="perc1"))
+    if type(rhythms) == LTVList:
+        return LTVList([Reference(value=pattern) for pattern in complements])
+    return complements[0]
+
+def density(rhythms):
+    """the proportion of the events of a rhythm (or of each rhythm of a list) that are notes"""
+    patterns = [it.value for it in rhythms.items] if type(rhythms) == LTVList else [rhythms]
+    densities = []
+    for pattern in patterns:
+        parts = rhythm_notes(pattern).parts
+        densities.append(sum(part.onsets.bit_count() for part in parts) / sum(len(part) for part in parts))
+    if type(rhythms) == LTVList:
+        return LTVList([Reference(value=value) for value in densities])
+    return densities[0]
+
+
+global_scope = {"concat":concat, "stack":stack, "print":print, "notes_per_part":notes_per_part, "count_parts":count_parts,
+                "duration":duration, "pitch_range":pitch_range, "union":union, "intersection":intersection, "xor":xor,
+                "complement":complement, "density":density}
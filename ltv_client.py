@@ -0,0 +1,33 @@
+"""thin client for `leitmotiv.py --serve`, only uses the standard library so that it starts instantly"""
+import sys
+import os
+import json
+import socket
+
+default_socket = f"/tmp/leitmotiv-{os.getuid()}.sock"
+
+def send(fname, socket_path=default_socket):
+    """asks the server to evaluate fname and returns its json response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps({"file": os.path.abspath(fname)}).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as response:
+            return json.loads(response.readline())
+
+if __name__ == "__main__":
+    fname = sys.argv[1]
+    socket_path = sys.argv[2] if len(sys.argv) > 2 else default_socket
+    try:
+        response = send(fname, socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        # no server running, evaluate the file the slow way
+        leitmotiv = os.path.join(os.path.dirname(os.path.abspath(__file__)), "leitmotiv.py")
+        os.execv(sys.executable, [sys.executable, leitmotiv, fname])
+    sys.stdout.write(response["output"])
+    if "error" in response:
+        sys.stderr.write(response["error"])
+        sys.exit(1)
+    for error in response["render_errors"]:
+        sys.stderr.write(error + "\n")
+    for image in response["images"]:
+        print(image)
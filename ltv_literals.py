@@ -0,0 +1,82 @@
+"""disk cache of the parsed abc"..." and perc1"..." literals, shared by every file and every run so that a motif used in
+many files is only converted once. a literal is stored as the arrays of its notes, the attributes the abc parser shares
+are stored as the abc text that makes them and the others as pickled music21 objects. the literals that only have a
+music21 stream (the ones with endings for example) are stored as a frozen stream"""
+import os
+import hashlib
+import pickle
+import shutil
+from copy import deepcopy
+import music21
+import ltv_abc
+import ltv_notes
+import ltv_render
+try:
+    import abc2xml
+except ImportError:
+    abc2xml = None
+
+cache_folder = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "leitmotiv-literals")
+# when the cache grows over this size (in bytes), the least recently used literals are deleted
+cache_size = 16 * 2**20
+# to change whenever the abc parser or the way literals are stored changes, the cached literals are then ignored
+format_version = 3
+converters_version = f"{format_version} {music21.VERSION_STR} {getattr(abc2xml, 'VERSION', None)}"
+
+def literal_path(abcstring, header):
+    key = f"{converters_version}\n{header}\n{abcstring}"
+    return os.path.join(cache_folder, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".pickle")
+
+def encode_attributes(attributes):
+    shared = {}
+    for (fn, text), value in ltv_abc.attribute_cache.items():
+        shared[id(value[0] if type(value) == tuple else value)] = (fn.__name__, text)
+    return [(position, shared.get(id(attribute), attribute)) for position, attribute in attributes]
+
+def decode_attributes(attributes):
+    decoded = []
+    for position, attribute in attributes:
+        if type(attribute) == tuple:
+            name, text = attribute
+            attribute = getattr(ltv_abc, name)(text)
+            if type(attribute) == tuple:
+                attribute = attribute[0]
+        decoded.append((position, attribute))
+    return decoded
+
+def load(abcstring, header):
+    """the ltv_notes arrays or the music21 stream of a literal, or None if it isn't in the cache"""
+    path = literal_path(abcstring, header)
+    try:
+        with open(path, "rb") as f:
+            kind, content = pickle.load(f)
+        if kind == "stream":
+            thawer = music21.freezeThaw.StreamThawer()
+            thawer.openStr(content)
+            content = thawer.stream
+        else:
+            content = ltv_notes.NoteArrays([ltv_notes.NotePart(*arrays, decode_attributes(attributes))
+                                            for *arrays, attributes in content])
+        # the modification time is the last use of the literal
+        os.utime(path)
+    except Exception:
+        return None
+    return content
+
+def store(abcstring, header, notes=None, stream=None):
+    if notes is not None:
+        content = ("notes", [(part.durations, part.ties, part.pitch_starts, part.steps, part.alters,
+                              encode_attributes(part.attributes)) for part in notes.parts])
+    else:
+        # freezing modifies the stream
+        content = ("stream", music21.freezeThaw.StreamFreezer(deepcopy(stream)).writeStr())
+    os.makedirs(cache_folder, exist_ok=True)
+    path = literal_path(abcstring, header)
+    # written next to its final path then moved so that another process never reads half a file
+    with open(path + f".{os.getpid()}", "wb") as f:
+        pickle.dump(content, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + f".{os.getpid()}", path)
+    ltv_render.evict(cache_folder, cache_size)
+
+def clear():
+    shutil.rmtree(cache_folder, ignore_errors=True)
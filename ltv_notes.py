@@ -0,0 +1,578 @@
+"""compact representation of patterns, the notes and rests of each part are stored in arrays instead of music21 objects.
+music21 streams are only built when a pattern is exported"""
+import music21
+import numpy
+import hashlib
+from array import array
+from itertools import accumulate, takewhile
+from fractions import Fraction
+from math import gcd
+from copy import deepcopy
+import m21_helpers
+
+# durations are integer ticks, a quarter note is divisible by every tuplet abc can write
+TICKS = 2**6 * 3**2 * 5 * 7
+
+NO_TIE, TIE_START, TIE_CONTINUE, TIE_STOP = range(4)
+tie_types = [None, "start", "continue", "stop"]
+
+# the pitch of the notes a rhythm gets when it had none, the B of the perc1 examples
+rhythm_pitch = (35, 0)
+
+step_names = "CDEFGAB"
+step_semitones = [0, 2, 4, 5, 7, 9, 11]
+
+def natural_midi(step):
+    """midi number of the natural note at a diatonic note number (C4 is 29)"""
+    octave, name = divmod(step - 1, 7)
+    return 12 * (octave + 1) + step_semitones[name]
+
+def m21_pitch(step, alter):
+    octave, name = divmod(step - 1, 7)
+    pitch = music21.pitch.Pitch(step_names[name], octave=octave)
+    if alter:
+        pitch.accidental = music21.pitch.Accidental(alter)
+    return pitch
+
+# how music21 spells each pitch class after a chromatic transposition, as (step, alter)
+chromatic_spelling = [(0, 0), (0, 1), (1, 0), (2, -1), (2, 0), (3, 0), (3, 1), (4, 0), (4, 1), (5, 0), (6, -1), (6, 0)]
+
+def spell_chromatic(midi):
+    octave, pitch_class = divmod(midi, 12)
+    name, alter = chromatic_spelling[pitch_class]
+    return (octave - 1) * 7 + name + 1, alter
+
+def interval_steps(interval):
+    """the number of diatonic steps and of semitones of an interval. music21 transposes by a number of semitones
+    chromatically and respells the result, the number of steps is None in that case"""
+    if type(interval) == int:
+        return None, interval
+    interval = music21.interval.Interval(interval)
+    directed = interval.generic.directed
+    steps = directed - 1 if directed > 0 else directed + 1
+    return steps, interval.semitones
+
+def transpose_pitch(step, alter, steps, semitones, key_alters=None):
+    """the (step, alter) of a pitch transposed by the result of interval_steps. like music21, a note (but not the notes of
+    a chord) transposed by semitones is respelled when the key it's in (key_alters, made by transposed_key_alters) alters
+    its pitch class the other way"""
+    target = natural_midi(step) + alter + semitones
+    if steps is not None:
+        return step + steps, target - natural_midi(step + steps)
+    step, alter = spell_chromatic(target)
+    if key_alters is not None and alter != 0 and key_alters.get(target % 12, alter) != alter:
+        step += 1 if alter > 0 else -1
+        alter = target - natural_midi(step)
+    return step, alter
+
+# transposing a music21 key takes milliseconds, the alterations are kept by (sharps, mode, semitones)
+key_alters_cache = {}
+
+def transposed_key_alters(attributes, semitones):
+    """the alteration of each pitch class in the keys of the attributes once transposed by semitones, as
+    (position, alterations) sorted by position"""
+    keys = []
+    for position, attribute in sorted(attributes, key=lambda attribute: attribute[0]):
+        if attribute.isClassOrSubclass(("KeySignature",)):
+            cache_key = (attribute.sharps, getattr(attribute, "mode", None), semitones)
+            if cache_key not in key_alters_cache:
+                key_alters_cache[cache_key] = {pitch.pitchClass: int(pitch.accidental.alter)
+                                               for pitch in attribute.transpose(semitones).alteredPitches}
+            keys.append((position, key_alters_cache[cache_key]))
+    return keys
+
+def transpose_keys(attributes, keys_interval):
+    return [(position, attribute.transpose(keys_interval) if attribute.isClassOrSubclass(("KeySignature",)) else attribute)
+            for position, attribute in attributes]
+
+# the bar lines are attributes too, a regular one marks the end of a measure
+regular_barline = music21.bar.Barline("regular")
+
+def is_barline(attribute):
+    return attribute.isClassOrSubclass(("Barline",))
+
+def join_attributes(attributes, added, position):
+    """adds the attributes of a part that starts at position, with a bar line between the two parts"""
+    # the attributes are in the order of their positions, only the ones at the junction are looked at
+    ends_with_bar = any(is_barline(attribute) for at, attribute in takewhile(lambda item: item[0] >= position,
+                                                                             reversed(attributes)))
+    starts_with_bar = any(is_barline(attribute) for at, attribute in takewhile(lambda item: item[0] == 0, added))
+    if position > 0 and not ends_with_bar and not starts_with_bar:
+        attributes.append((position, regular_barline))
+    attributes.extend((at + position, attribute) for at, attribute in added)
+
+def beam_long_measure(measure):
+    """music21 doesn't beam the measures longer than their time signature (a literal without bar lines), they are beamed
+    as if the time signature had as many beats as the measure"""
+    time_signature = measure.timeSignature or measure.getContextByClass(music21.meter.TimeSignature)
+    if time_signature is None:
+        return
+    beats = Fraction(measure.duration.quarterLength) * time_signature.denominator / 4
+    notes = measure.notesAndRests.stream()
+    if beats.denominator != 1 or len(notes) < 2:
+        return
+    beams = music21.meter.TimeSignature(f"{beats.numerator}/{time_signature.denominator}").getBeams(notes)
+    for note, note_beams in zip(notes, beams):
+        note.beams = note_beams if note_beams is not None else music21.beam.Beams()
+
+class NotePart:
+    """a part made of a sequence of events (note, chord or rest). durations and ties have one entry per event, steps
+    (diatonic note numbers) and alters have one entry per pitch and the pitches of event i are
+    steps[pitch_starts[i]:pitch_starts[i+1]], a rest has none. attributes are the other music21 elements (clefs, keys,
+    time signatures, barlines...) with the index of the event they come before"""
+    def __init__(self, durations, ties, pitch_starts, steps, alters, attributes):
+        self.durations = durations
+        self.ties = ties
+        self.pitch_starts = pitch_starts
+        self.steps = steps
+        self.alters = alters
+        self.attributes = attributes
+        self._fingerprint = None
+
+    def __len__(self):
+        return len(self.durations)
+
+    def copy(self):
+        """a part with its own arrays, that can be modified in place"""
+        return NotePart(array("q", self.durations), array("b", self.ties), array("l", self.pitch_starts),
+                        array("h", self.steps), array("b", self.alters), list(self.attributes))
+
+    def events(self):
+        """(duration, tie, pitches) of each event, pitches being a tuple of (step, alter)"""
+        for i in range(len(self.durations)):
+            start, end = self.pitch_starts[i], self.pitch_starts[i+1]
+            yield self.durations[i], self.ties[i], tuple(zip(self.steps[start:end], self.alters[start:end]))
+
+    @classmethod
+    def from_events(cls, events, attributes):
+        durations, ties, pitch_starts, steps, alters = array("q"), array("b"), array("l", [0]), array("h"), array("b")
+        for duration, tie, pitches in events:
+            durations.append(duration)
+            ties.append(tie)
+            for step, alter in pitches:
+                steps.append(step)
+                alters.append(alter)
+            pitch_starts.append(len(steps))
+        return cls(durations, ties, pitch_starts, steps, alters, attributes)
+
+    @classmethod
+    def from_m21(cls, part):
+        """returns None when the part has something this representation can't hold (voices, grace notes,
+        articulations, spanners, microtones...)"""
+        events = []
+        attributes = []
+        time = 0
+        for el in part.flat:
+            if el.isClassOrSubclass(("Note", "Rest", "Chord")):
+                duration = Fraction(el.quarterLength) * TICKS
+                if el.offset != Fraction(time, TICKS) or duration.denominator != 1 or duration == 0:
+                    return None
+                if el.articulations or el.expressions or el.lyrics:
+                    return None
+                pitches = []
+                for pitch in (() if el.isRest else el.pitches):
+                    alter = pitch.accidental.alter if pitch.accidental is not None else 0
+                    if alter != int(alter) or pitch.microtone.cents != 0:
+                        return None
+                    pitches.append((pitch.diatonicNoteNum, int(alter)))
+                tie = tie_types.index(el.tie.type) if el.tie is not None and el.tie.type in tie_types else NO_TIE
+                events.append((int(duration), tie, pitches))
+                time += int(duration)
+            elif el.isClassOrSubclass(("GeneralNote", "Spanner", "Stream")):
+                return None
+            else:
+                attributes.append((len(events), deepcopy(el)))
+        # the measures start on events, a regular bar line ends the ones that don't end with another bar line
+        starts = {Fraction(measure.offset) * TICKS for measure in part.getElementsByClass("Measure")[1:]}
+        offset = 0
+        for i, (duration, tie, pitches) in enumerate(events):
+            if offset in starts and not any(at == i and is_barline(attribute) for at, attribute in attributes):
+                attributes.append((i, regular_barline))
+            offset += duration
+        attributes.sort(key=lambda attribute: attribute[0])
+        return cls.from_events(events, attributes)
+
+    def to_m21(self):
+        """a music21 part with a measure between each bar line, like abc2xml makes them"""
+        part = music21.stream.Part()
+        attributes = sorted(self.attributes, key=lambda attribute: attribute[0])
+        barlines = [(position, attribute) for position, attribute in attributes if is_barline(attribute)]
+        # a [M:] or [K:] field replaces the time signature or key that is at the same position (the default ones)
+        kept, replaced = [], set()
+        for position, attribute in reversed(attributes):
+            kind = next((kind for kind in ("TimeSignature", "KeySignature") if attribute.isClassOrSubclass((kind,))), None)
+            if not is_barline(attribute) and (position, kind) not in replaced:
+                kept.append((position, attribute))
+                if kind is not None:
+                    replaced.add((position, kind))
+        attributes = kept[::-1]
+        cuts = sorted({position for position, barline in barlines if 0 < position < len(self)})
+        events = list(self.events())
+        measures = []
+        current_attribute = 0
+        for start, end in zip([0] + cuts, cuts + [len(self)]):
+            elements = []
+            for i in range(start, end):
+                while current_attribute < len(attributes) and attributes[current_attribute][0] <= i:
+                    elements.append(deepcopy(attributes[current_attribute][1]))
+                    current_attribute += 1
+                duration, tie, pitches = events[i]
+                quarter_length = Fraction(duration, TICKS)
+                if len(pitches) == 0:
+                    el = music21.note.Rest(quarterLength=quarter_length)
+                elif len(pitches) == 1:
+                    el = music21.note.Note(m21_pitch(*pitches[0]), quarterLength=quarter_length)
+                else:
+                    el = music21.chord.Chord([m21_pitch(*pitch) for pitch in pitches], quarterLength=quarter_length)
+                if tie != NO_TIE:
+                    el.tie = music21.tie.Tie(tie_types[tie])
+                elements.append(el)
+            if end == len(self):
+                elements.extend(deepcopy(attribute) for position, attribute in attributes[current_attribute:])
+            measure = music21.stream.Measure(number=len(measures) + 1)
+            measure.append(elements)
+            measures.append(measure)
+        starts = dict(zip([0] + cuts, measures))
+        ends = dict(zip(cuts + [len(self)], measures))
+        for position, barline in barlines:
+            if barline.isClassOrSubclass(("Repeat",)) and barline.direction == "start":
+                if position in starts:
+                    starts[position].leftBarline = deepcopy(barline)
+            elif position in ends and barline.type != "regular":
+                ends[position].rightBarline = deepcopy(barline)
+        part.append(measures)
+        # the measures shorter than their time signature are a pickup or an incomplete measure, not rests to fill
+        for measure in measures:
+            missing = measure.barDuration.quarterLength - measure.duration.quarterLength
+            if missing > 0:
+                if measure is measures[0] and len(measures) > 1:
+                    measure.paddingLeft = missing
+                else:
+                    measure.paddingRight = missing
+        part.makeBeams(inPlace=True)
+        for measure in measures:
+            if measure.duration.quarterLength > measure.barDuration.quarterLength:
+                beam_long_measure(measure)
+        return part
+
+    def fingerprint(self):
+        """a digest of the events and attributes of the part, computed once unless the part is modified in place"""
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            for values in (self.durations, self.ties, self.pitch_starts, self.steps, self.alters):
+                digest.update(len(values).to_bytes(8, "little"))
+                digest.update(values.tobytes())
+            for position, attribute in self.attributes:
+                digest.update(f"{position} {attribute!r}\n".encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def is_chord(self, i):
+        return self.pitch_starts[i+1] - self.pitch_starts[i] > 1
+
+    def count_notes(self):
+        """notes and rests, chords aren't counted"""
+        return sum(1 for i in range(len(self)) if not self.is_chord(i))
+
+    def duration(self):
+        return sum(self.durations)
+
+    def shift(self, shift, in_place=False):
+        """rotates the notes and rests, chords and attributes stay where they are. in place, the arrays of this part are
+        rewritten (they keep their length since the events only move) and the part is returned"""
+        events = list(self.events())
+        positions = [i for i in range(len(events)) if not self.is_chord(i)]
+        a = shift % len(positions) if positions else 0
+        if a == 0:
+            return self
+        for position, event in zip(positions, [events[i] for i in positions[-a:] + positions[:-a]]):
+            events[position] = event
+        if not in_place:
+            return NotePart.from_events(events, self.attributes)
+        for i, (duration, tie, pitches) in enumerate(events):
+            self.durations[i] = duration
+            self.ties[i] = tie
+            start = self.pitch_starts[i]
+            self.pitch_starts[i+1] = start + len(pitches)
+            for j, (step, alter) in enumerate(pitches):
+                self.steps[start+j] = step
+                self.alters[start+j] = alter
+        self._fingerprint = None
+        return self
+
+    def transpose(self, steps, semitones, keys_interval=None, in_place=False):
+        """in place, the steps and alters of this part are rewritten and the part is returned"""
+        if in_place:
+            new_steps, new_alters = self.steps, self.alters
+        else:
+            new_steps, new_alters = array("h", self.steps), array("b", self.alters)
+        keys = transposed_key_alters(self.attributes, semitones) if steps is None else []
+        key_alters = None
+        for i in range(len(self)):
+            while keys and keys[0][0] <= i:
+                key_alters = keys.pop(0)[1]
+            start, end = self.pitch_starts[i], self.pitch_starts[i+1]
+            for j in range(start, end):
+                new_steps[j], new_alters[j] = transpose_pitch(new_steps[j], new_alters[j], steps, semitones,
+                                                              key_alters if end - start == 1 else None)
+        attributes = self.attributes
+        if keys_interval is not None:
+            attributes = transpose_keys(attributes, keys_interval)
+        if in_place:
+            self.attributes[:] = attributes
+            self._fingerprint = None
+            return self
+        return NotePart(self.durations, self.ties, self.pitch_starts, new_steps, new_alters, attributes)
+
+    @classmethod
+    def join(cls, parts):
+        """the parts one after the other, each starting a new measure"""
+        durations, ties, pitch_starts, steps, alters = array("q"), array("b"), array("l", [0]), array("h"), array("b")
+        attributes = []
+        for part in parts:
+            join_attributes(attributes, part.attributes, len(durations))
+            offset = len(steps)
+            pitch_starts.extend(start + offset for start in part.pitch_starts[1:])
+            durations.extend(part.durations)
+            ties.extend(part.ties)
+            steps.extend(part.steps)
+            alters.extend(part.alters)
+        return cls(durations, ties, pitch_starts, steps, alters, attributes)
+
+def spread_bits(bits, factor):
+    """the bits of a mask on a grid factor times finer"""
+    if factor == 1:
+        return bits
+    return int("".join(bit + "0" * (factor - 1) for bit in format(bits, "b")[::-1])[::-1], 2) if bits else 0
+
+class RhythmPart(NotePart):
+    """a single line percussion part (a perc1 pattern) on a grid of cells of unit ticks, the greatest common divisor of
+    its durations. bit i of starts is set when an event (note or rest) starts on cell i, it lasts until the next one, and
+    bit i of onsets when that event is a note, every note having the same pitch. shifting rotates the bits and joining
+    shifts and ors them. the arrays of NotePart are only built when something reads them"""
+    def __init__(self, onsets, length, unit, pitch, attributes, starts=None):
+        self.onsets = onsets
+        self.length = length
+        self.unit = unit
+        self.pitch = pitch
+        self.attributes = attributes
+        # every cell starts an event by default
+        self.starts = (1 << length) - 1 if starts is None else starts
+        self._fingerprint = None
+        self._arrays = None
+
+    @classmethod
+    def from_part(cls, part):
+        """returns None when the part has ties, chords or several pitches"""
+        if len(part) == 0 or any(tie != NO_TIE for tie in part.ties):
+            return None
+        is_note = [part.pitch_starts[i+1] > part.pitch_starts[i] for i in range(len(part))]
+        pitches = set(zip(part.steps, part.alters))
+        if len(pitches) > 1 or len(part.steps) != sum(is_note):
+            return None
+        unit = 0
+        for duration in set(part.durations):
+            unit = gcd(unit, duration)
+        onsets, starts = [], []
+        for duration, note in zip(part.durations, is_note):
+            rest = "0" * (duration // unit - 1)
+            starts.append("1" + rest)
+            onsets.append(("1" if note else "0") + rest)
+        onsets, starts = "".join(onsets), "".join(starts)
+        return cls(int(onsets[::-1], 2), len(starts), unit, pitches.pop() if pitches else None, part.attributes,
+                   int(starts[::-1], 2))
+
+    def on_grid(self, unit):
+        """the same rhythm on cells of unit ticks, unit dividing the one of the part"""
+        factor = self.unit // unit
+        if factor == 1:
+            return self
+        return RhythmPart(spread_bits(self.onsets, factor), self.length * factor, unit, self.pitch, self.attributes,
+                          spread_bits(self.starts, factor))
+
+    @classmethod
+    def join_rhythms(cls, parts):
+        """the parts one after the other, on the grid of the finest one, or None if they aren't all rhythms on the same
+        pitch"""
+        if any(type(part) != RhythmPart for part in parts):
+            return None
+        pitches = {part.pitch for part in parts if part.onsets}
+        if len(pitches) > 1:
+            return None
+        unit = 0
+        for part in parts:
+            unit = gcd(unit, part.unit)
+        onsets, starts, length, events, attributes = 0, 0, 0, 0, []
+        for part in parts:
+            join_attributes(attributes, part.attributes, events)
+            part = part.on_grid(unit)
+            onsets |= part.onsets << length
+            starts |= part.starts << length
+            length += part.length
+            events += len(part)
+        return cls(onsets, length, unit, pitches.pop() if pitches else None, attributes, starts)
+
+    @classmethod
+    def from_grid(cls, row, unit, pitch, attributes, starts=None):
+        """a part from a numpy array of booleans, one per cell. every cell is an event unless starts has the bits of the
+        cells that start one"""
+        onsets = int.from_bytes(numpy.packbits(row, bitorder="little").tobytes(), "little")
+        return cls(onsets, len(row), unit, pitch, attributes, None if starts is None else starts | onsets)
+
+    def bits(self, bits=None):
+        """"1" or "0" for each cell, of the onsets unless another mask is given"""
+        return format(self.onsets if bits is None else bits, f"0{self.length}b")[::-1]
+
+    def grid_row(self, length):
+        """the onsets as a numpy array of booleans padded with rests to length"""
+        row = numpy.unpackbits(numpy.frombuffer(self.onsets.to_bytes(length // 8 + 1, "little"), dtype=numpy.uint8),
+                               bitorder="little")
+        return row[:length].astype(bool)
+
+    def cells(self):
+        """the (first cell, number of cells, is a note) of each event"""
+        starts = [i for i, bit in enumerate(self.bits(self.starts)) if bit == "1"]
+        return [(start, end - start, self.onsets >> start & 1 == 1) for start, end in zip(starts, starts[1:] + [self.length])]
+
+    def arrays(self):
+        if self._arrays is None:
+            if self.starts == (1 << self.length) - 1:
+                # one cell per event
+                durations = array("q", [self.unit]) * self.length
+                is_note = [bit == "1" for bit in self.bits()]
+            else:
+                cells = self.cells()
+                durations = array("q", [count * self.unit for start, count, note in cells])
+                is_note = [note for start, count, note in cells]
+            notes = sum(is_note)
+            step, alter = self.pitch if self.pitch is not None else (0, 0)
+            self._arrays = (durations, array("b", [NO_TIE]) * len(durations), array("l", [0, *accumulate(is_note)]),
+                            array("h", [step]) * notes, array("b", [alter]) * notes)
+        return self._arrays
+
+    durations = property(lambda self: self.arrays()[0])
+    ties = property(lambda self: self.arrays()[1])
+    pitch_starts = property(lambda self: self.arrays()[2])
+    steps = property(lambda self: self.arrays()[3])
+    alters = property(lambda self: self.arrays()[4])
+
+    def __len__(self):
+        return self.starts.bit_count()
+
+    def events(self):
+        durations, pitch_starts = self.durations, self.pitch_starts
+        for i, duration in enumerate(durations):
+            yield duration, NO_TIE, ((self.pitch,) if pitch_starts[i+1] > pitch_starts[i] else ())
+
+    def copy(self):
+        return RhythmPart(self.onsets, self.length, self.unit, self.pitch, list(self.attributes), self.starts)
+
+    def is_chord(self, i):
+        return False
+
+    def count_notes(self):
+        return len(self)
+
+    def duration(self):
+        return self.length * self.unit
+
+    def changed(self):
+        self._fingerprint = None
+        self._arrays = None
+        return self
+
+    def shift(self, shift, in_place=False):
+        """rotates the events, by rotating the bits of the cells they start on"""
+        events = len(self)
+        a = shift % events
+        if a == 0:
+            cells = 0
+        elif self.starts == (1 << self.length) - 1:
+            cells = a
+        else:
+            # the last a events move to the start
+            cells = self.length - self.cells()[events - a][0]
+        mask = (1 << self.length) - 1
+        onsets = (self.onsets << cells | self.onsets >> (self.length - cells)) & mask
+        starts = (self.starts << cells | self.starts >> (self.length - cells)) & mask
+        if in_place:
+            self.onsets, self.starts = onsets, starts
+            return self.changed()
+        return RhythmPart(onsets, self.length, self.unit, self.pitch, self.attributes, starts)
+
+    def transpose(self, steps, semitones, keys_interval=None, in_place=False):
+        keys = transposed_key_alters(self.attributes, semitones) if steps is None else []
+        key_alters = ([alters for position, alters in keys if position == 0] or [None])[-1]
+        pitch = transpose_pitch(*self.pitch, steps, semitones, key_alters) if self.pitch is not None else None
+        attributes = transpose_keys(self.attributes, keys_interval) if keys_interval is not None else self.attributes
+        if in_place:
+            self.pitch = pitch
+            self.attributes[:] = attributes
+            return self.changed()
+        return RhythmPart(self.onsets, self.length, self.unit, pitch, attributes, self.starts)
+
+class NoteArrays:
+    """the parts of a pattern. the operations return new arrays unless they are asked to work in place, which a pattern
+    only does on arrays it copied for itself"""
+    def __init__(self, parts):
+        self.parts = parts
+
+    def copy(self):
+        return NoteArrays([part.copy() for part in self.parts])
+
+    def to_m21(self):
+        stream = music21.stream.Score()
+        for part in self.parts:
+            stream.append(part.to_m21())
+        return stream
+
+    def count_notes(self):
+        return max([part.count_notes() for part in self.parts])
+
+    def fingerprint(self):
+        """a digest that is the same for the arrays holding the same notes, made from the digests of the parts so the parts
+        shared with other patterns are only hashed once"""
+        return hashlib.sha1(" ".join(part.fingerprint() for part in self.parts).encode("utf-8")).hexdigest()
+
+    def shift(self, shift, in_place=False):
+        parts = [part.shift(shift, in_place) for part in self.parts]
+        return self if in_place else NoteArrays(parts)
+
+    def transpose(self, interval, keep_keys=False, in_place=False):
+        steps, semitones = interval_steps(interval)
+        keys_interval = music21.interval.Interval(interval) if keep_keys else None
+        parts = [part.transpose(steps, semitones, keys_interval, in_place) for part in self.parts]
+        return self if in_place else NoteArrays(parts)
+
+def from_m21(stream):
+    """builds the arrays of a music21 stream, or returns None if one of its parts can't be represented"""
+    parts = [NotePart.from_m21(part) for part in m21_helpers.getParts(stream)]
+    if len(parts) == 0 or None in parts:
+        return None
+    return NoteArrays(parts)
+
+def concat(patterns):
+    """concatenates the parts with the same index, a part missing from the first patterns starts at the beginning"""
+    parts = [[] for i in range(max([len(notes.parts) for notes in patterns]))]
+    for notes in patterns:
+        for i, part in enumerate(notes.parts):
+            parts[i].append(part)
+    return NoteArrays([RhythmPart.join_rhythms(part) or NotePart.join(part) for part in parts])
+
+def stack(patterns):
+    return NoteArrays([part for notes in patterns for part in notes.parts])
+
+def rhythms(notes):
+    """the arrays with the parts that can be held by a RhythmPart turned into one"""
+    parts = [part if type(part) == RhythmPart else RhythmPart.from_part(part) or part for part in notes.parts]
+    if all(new is old for new, old in zip(parts, notes.parts)):
+        return notes
+    return NoteArrays(parts)
+
+def rhythm_grid(parts):
+    """a numpy matrix of booleans with the onsets of each RhythmPart on a row, the shorter ones are padded with rests.
+    None when one of the parts isn't a RhythmPart"""
+    if any(type(part) != RhythmPart for part in parts):
+        return None
+    length = max(part.length for part in parts)
+    return numpy.array([part.grid_row(length) for part in parts], dtype=bool).reshape(len(parts), length)
@@ -0,0 +1,134 @@
+"""renders abc tunes to svg with abcm2ps. the images are named by a hash of the whole tune (headers included) and kept
+in a cache folder shared by every file and every run, a display that was already rendered once only costs a stat"""
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import run
+
+cache_folder = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "leitmotiv")
+# when the cache grows over this size (in bytes), the least recently used images are deleted
+cache_size = 64 * 2**20
+# number of abcm2ps processes that can run at the same time
+pool_size = os.cpu_count() or 1
+# number of tunes rendered by each abcm2ps run started during the evaluation
+batch_size = 8
+
+def svg_path(pre_header, tune):
+    return os.path.join(cache_folder, hashlib.sha1((pre_header + tune).encode("utf-8")).hexdigest() + ".svg")
+
+def is_cached(svg):
+    if os.path.exists(svg):
+        # the modification time is the last use of the image
+        os.utime(svg)
+        return True
+    return False
+
+def render(pre_header, tune):
+    """path of the svg of a tune, abcm2ps only runs when it isn't in the cache"""
+    svg = svg_path(pre_header, tune)
+    if not is_cached(svg):
+        os.makedirs(cache_folder, exist_ok=True)
+        failures = run_abcm2ps(pre_header, {svg: tune})
+        evict()
+        if failures:
+            raise Exception(f"could not render {svg}: {failures[0][1]}")
+    return svg
+
+def run_abcm2ps(pre_header, batch):
+    """renders a {svg path: tune} dict in one multi-tune abc file, returns the (svg path, error) of the tunes that
+    abcm2ps didn't render"""
+    base = os.path.join(cache_folder, "batch-" + hashlib.sha1("".join(batch).encode("utf-8")).hexdigest())
+    # a blank line ends a tune
+    tunes = ["\n".join(line for line in tune.split("\n") if line.strip() != "") for tune in batch.values()]
+    open(base + ".abc", "w").write(pre_header + "\n\n" + "\n\n".join(tunes) + "\n")
+    try:
+        result = run(["abcm2ps", "-g", base + ".abc", "-O", base + ".svg"], capture_output=True, text=True)
+        error = result.stderr.strip() or f"abcm2ps exited with {result.returncode}"
+    except OSError as e:
+        error = str(e)
+    os.remove(base + ".abc")
+    failures = []
+    # abcm2ps writes one file per tune and numbers them from 001
+    for i, svg in enumerate(batch):
+        if os.path.exists(f"{base}{i+1:03d}.svg"):
+            os.replace(f"{base}{i+1:03d}.svg", svg)
+        else:
+            failures.append((svg, error))
+    return failures
+
+class RenderPool:
+    """renders tunes in worker threads while the program keeps being evaluated. the submitted tunes wait until there are
+    batch_size of them with the same pre header, they are then rendered by a job in one abcm2ps run, join renders the
+    ones still waiting"""
+    def __init__(self, size=None):
+        self.executor = ThreadPoolExecutor(max_workers=size or pool_size)
+        self.lock = threading.Lock()
+        # {pre_header: {svg path: tune}} of the tunes no job took yet
+        self.pending = {}
+        self.rendering = set()
+        self.jobs = []
+        self.failures = []
+
+    def submit(self, pre_header, tune):
+        """returns the path the svg of the tune will have"""
+        svg = svg_path(pre_header, tune)
+        with self.lock:
+            if svg in self.rendering or svg in self.pending.get(pre_header, {}) or is_cached(svg):
+                return svg
+        self.pending.setdefault(pre_header, {})[svg] = tune
+        if len(self.pending[pre_header]) >= batch_size:
+            self.start(pre_header)
+        return svg
+
+    def start(self, pre_header):
+        batch = self.pending.pop(pre_header)
+        with self.lock:
+            self.rendering.update(batch)
+        self.jobs.append(self.executor.submit(self.render_batch, pre_header, batch))
+
+    def render_batch(self, pre_header, batch):
+        failures = []
+        try:
+            os.makedirs(cache_folder, exist_ok=True)
+            failures = run_abcm2ps(pre_header, batch)
+        except Exception as e:
+            failures = [(svg, str(e)) for svg in batch]
+        finally:
+            with self.lock:
+                self.rendering.difference_update(batch)
+                self.failures.extend(failures)
+
+    def join(self):
+        """waits for every submitted tune, returns the (svg path, error) of the ones that couldn't be rendered"""
+        for pre_header in list(self.pending):
+            self.start(pre_header)
+        rendered = len(self.jobs) > 0
+        for job in self.jobs:
+            job.result()
+        self.jobs = []
+        if rendered:
+            evict()
+        failures, self.failures = self.failures, []
+        return failures
+
+def evict(folder=None, size=None):
+    """deletes the least recently used files of a cache folder (the images by default) until it fits in size"""
+    folder = cache_folder if folder is None else folder
+    size = cache_size if size is None else size
+    files = []
+    for name in os.listdir(folder):
+        try:
+            stat = os.stat(os.path.join(folder, name))
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, name))
+    total = sum(file_size for mtime, file_size, name in files)
+    for mtime, file_size, name in sorted(files):
+        if total <= size:
+            break
+        try:
+            os.remove(os.path.join(folder, name))
+        except FileNotFoundError:
+            pass
+        total -= file_size
@@ -1,7 +1,30 @@
-def findByClass(stream, classlist):
+"""queries on music21 streams. the flat elements of a stream are indexed by class once and the index is kept in the cache
+of the stream, music21 empties that cache whenever the elements of the stream (or of a stream inside it) change"""
+
+def index(stream):
+    """the flat elements of a stream and the positions of the elements of each class name in them"""
+    if "ltv_index" not in stream._cache:
+        elements = list(stream.flat)
+        positions = {}
+        for i, el in enumerate(elements):
+            for name in el.classes:
+                positions.setdefault(name, []).append(i)
+        stream._cache["ltv_index"] = (elements, positions)
+    return stream._cache["ltv_index"]
+
+def positionsByClass(stream, classlist):
     if type(classlist) not in {tuple, list}:
         classlist = (classlist,)
-    return list(filter(lambda el: el.isClassOrSubclass(classlist), stream.flat))
+    elements, positions = index(stream)
+    if len(classlist) == 1:
+        return list(positions.get(classlist[0], []))
+    return sorted(set().union(*[positions.get(name, []) for name in classlist]))
+
+def findByClass(stream, classlist):
+    elements, positions = index(stream)
+    return [elements[i] for i in positionsByClass(stream, classlist)]
 
 def getParts(stream):
-    return list(filter(lambda el: el.isClassOrSubclass(("Part",)), list(stream)))
+    if "ltv_parts" not in stream._cache:
+        stream._cache["ltv_parts"] = list(filter(lambda el: el.isClassOrSubclass(("Part",)), list(stream)))
+    return list(stream._cache["ltv_parts"])
@@ -1,5 +1,17 @@
+import os
+import subprocess
+import pytest
 import leitmotiv
+import ltv_builtins
+import ltv_abc
+import ltv_render
+import ltv_literals
+import ltv_notes
+import m21_helpers
+import music21
 interpreter = leitmotiv.LTVInterpreter()
+# the tests that need the literals on disk turn this on with their own folder
+ltv_builtins.literal_disk_cache = False
 
 def mk_val(value):
     return leitmotiv.Reference(value=value)
@@ -58,3 +70,439 @@ b = [2,
 ][1]
 """
     ) == mk_val(5)
+
+def test_fn():
+    assert ltv_eval(
+        """
+add = fn(first, second) {
+    first + second
+}
+i = 0
+total = 0
+while i < 4 {
+    total = add(total, i)
+    i = i + 1
+}
+total
+"""
+    ) == mk_val(6)
+
+def test_scopes():
+    # arguments shadow the globals, functions see the variables of the block they were defined in
+    result = ltv_eval(
+        """
+x = 10
+make_adder = fn(x) {
+    fn(y) {
+        x + y
+    }
+}
+add = make_adder(1)
+if 1 {
+    local = 5
+    x = add(local)
+}
+[x, local]
+"""
+    ).value
+    assert [item.value for item in result.items] == [6, None]
+    # functions read the global variables when they are called
+    assert ltv_eval(
+        """
+scale = 2
+scaled = fn(x) {
+    x * scale
+}
+scale = 3
+fact = fn(n) {
+    if n > 1 {
+        n * fact(n - 1)
+    } else {
+        1
+    }
+}
+scaled(fact(4))
+"""
+    ) == mk_val(72)
+    # a variable of a function starts as the global it hides, assigning it doesn't change the global
+    result = ltv_eval(
+        """
+a = 1
+c = 5
+f = fn() {
+    a = a + 1
+    i = 0
+    while i < 3 {
+        c = c + 1
+        i = i + 1
+    }
+    [a, c]
+}
+[f(), a, c]
+"""
+    ).value
+    assert [item.value for item in result.items[0].value.items] == [2, 8]
+    assert [item.value for item in result.items[1:]] == [1, 5]
+
+def test_memo():
+    interpreter.evaluate_program(
+        """
+add_b = memo fn(seq, transpo) {
+     concat(seq.transpose(transpo), abc"b")
+}
+i = 0
+while i < 4 {
+    seq = add_b(abc"cde", 3)
+    seq->shift(1)
+    i = i + 1
+}
+modifies = memo fn(seq) {
+    seq->shift(1)
+}
+"""
+    )
+    add_b = interpreter.globals["add_b"]
+    assert (add_b.hits, add_b.misses) == (3, 1)
+    assert type(interpreter.globals["modifies"]) == leitmotiv.LTVFunc
+    # modifying a result doesn't modify the cached one
+    expected = ltv_eval('concat(abc"cde".transpose(3), abc"b")').value
+    assert add_b(ltv_builtins.Pattern("cde"), 3).fingerprint() == expected.fingerprint()
+
+def test_fingerprint(monkeypatch):
+    assert ltv_eval('abc"cde" == abc"c d e"') == mk_val(True)
+    assert ltv_eval('abc"cde" == perc1"cde"') == mk_val(False)
+    seq = ltv_eval('seq = abc"cde"\nseq->shift(1)\nseq').value
+    # the side effect changed the fingerprint
+    assert seq == ltv_eval('abc"ecd"').value and seq != ltv_eval('abc"cde"').value
+    assert len({seq, ltv_eval('abc"ecd"').value}) == 1
+    monkeypatch.setattr(ltv_builtins, "native_backend", False)
+    assert ltv_eval('abc"ecd"').value.notes is None
+    assert ltv_eval('abc"ecd"').value == seq
+
+def test_literal_cache(monkeypatch):
+    first = ltv_eval('abc"c/d/e"').value
+    # the literal isn't parsed again, the new pattern shares its arrays with the cached one
+    monkeypatch.setattr(ltv_abc, "parse", None)
+    second = ltv_eval('seq = abc"c/d/e"\nseq->shift(1)\nabc"c/d/e"').value
+    assert second is not first and second.notes is first.notes
+    assert ltv_eval('abc"c/d/e"').value == first
+
+def test_literal_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ltv_builtins, "literal_disk_cache", True)
+    monkeypatch.setattr(ltv_literals, "cache_folder", str(tmp_path))
+    program = 'abc"[K:D] c2 |: d/e/ :|"'
+    parsed = ltv_eval(program).value
+    assert len(os.listdir(tmp_path)) == 1
+    # another run loads the arrays instead of parsing the abc
+    monkeypatch.setattr(ltv_builtins, "literal_cache", {})
+    monkeypatch.setattr(ltv_abc, "parse", None)
+    loaded = ltv_eval(program).value
+    assert loaded == parsed and loaded.notes.parts[0].attributes == parsed.notes.parts[0].attributes
+    ltv_literals.clear()
+    assert not os.path.exists(tmp_path)
+
+def test_lazy_patterns(monkeypatch):
+    program = 'abc"^c d _e [ce] z".transpose(2, 1).transpose(3, 1).shift(1).shift(-3).transpose("M2").transpose("m-3")'
+    lazy = ltv_eval(program).value
+    # the consecutive transformations are merged and nothing runs until the notes are needed
+    assert [args for fn, args, kwargs in lazy.operations] == [(5, 1), (-2,), ("m-2",)]
+    assert lazy.count_notes() == 4 and lazy.operations == []
+    monkeypatch.setattr(ltv_builtins, "lazy_patterns", False)
+    assert ltv_eval(program).value == lazy
+
+def test_lazy_errors():
+    # the arguments of a lazy method are checked by the line that calls it
+    with pytest.raises(Exception):
+        ltv_eval('a = abc"c d e"\nb = a.shift("x")\n')
+    with pytest.raises(Exception):
+        ltv_eval('a = abc"c d e"\na->transpose("x3")\n')
+    # an operation that fails stays in the queue with the ones after it, the ones before it are done
+    pattern = ltv_eval('abc"c d e".shift(1).transpose(2)').value
+    transpose = pattern.operations[1]
+    pattern.operations[1:] = [(transpose[0], ("x3",), {}), transpose]
+    with pytest.raises(Exception):
+        pattern.count_notes()
+    assert [args for fn, args, kwargs in pattern.operations] == [("x3",), (2,)]
+    assert [str(p) for p in pattern._notes.to_m21().flat.pitches] == ["E5", "C5", "D5"]
+
+def test_in_place_side_effects():
+    literal = ltv_eval('abc"c d e [ce] z"').value
+    seq = literal.copy()
+    seq.transpose(2, side_effect=True)
+    copy = seq.copy()
+    parts = []
+    for i in range(3):
+        seq.shift(1, side_effect=True)
+        seq.transpose(1, side_effect=True)
+        seq.count_notes()
+        part = seq.current_notes().parts[0]
+        parts.append((part, part.steps, part.durations))
+    # the pattern copied the arrays it shared once and then works in them
+    assert all(a is b for a, b in zip(parts[0], parts[1])) and all(a is b for a, b in zip(parts[1], parts[2]))
+    assert seq == ltv_eval('abc"c d e [ce] z".transpose(2).shift(3).transpose(3)').value
+    # the patterns that shared the arrays didn't change
+    assert literal == ltv_eval('abc"c d e [ce] z"').value
+    assert copy == ltv_eval('abc"c d e [ce] z".transpose(2)').value
+
+def test_rhythms(monkeypatch):
+    program = """
+c = perc1"|: B/B/ z/B/ :|"
+s = c.shift(1)
+s->shift(2)
+m = perc1"B z/ B/ B"
+[c, s, concat(c, c.shift(-1), perc1"B B/"), stack(c, c.transpose(2)), concat(c, perc1"B- B"), m, m.shift(1)]
+"""
+    rhythms = [item.value for item in ltv_eval(program).value.items]
+    part = rhythms[0].notes.parts[0]
+    assert type(part) == ltv_notes.RhythmPart and (part.onsets, part.length) == (0b1011, 4)
+    assert rhythms[1].notes.parts[0].onsets == 0b1101
+    # the notes of different lengths span several cells of the grid of their greatest common divisor
+    assert [type(part) for part in rhythms[2].notes.parts] == [ltv_notes.RhythmPart]
+    assert [type(part) for part in rhythms[3].notes.parts] == [ltv_notes.RhythmPart] * 2
+    part = rhythms[5].notes.parts[0]
+    assert (part.bits(), part.bits(part.starts), len(part)) == ("100110", "101110", 4)
+    assert rhythms[6].notes.parts[0].bits() == "101001"
+    # the parts with ties are kept as arrays
+    assert [type(part) for part in rhythms[4].notes.parts] == [ltv_notes.NotePart]
+    monkeypatch.setattr(ltv_notes, "rhythms", lambda notes: notes)
+    monkeypatch.setattr(ltv_builtins, "literal_cache", {})
+    assert [item.value for item in ltv_eval(program).value.items] == rhythms
+
+def test_rhythm_algebra():
+    result = ltv_eval(
+        """
+a = perc1"B/B/ z/B/ z/z/"
+b = perc1"z/B/ B/B/"
+rhythms = [a, b, a.shift(1)]
+[union(a, b), intersection(a, b), xor(rhythms), complement(rhythms), density(rhythms)]
+"""
+    ).value
+    union, intersection, xor, complements, densities = [item.value for item in result.items]
+    assert [pattern.notes.parts[0].bits() for pattern in (union, intersection, xor)] == ["111100", "010100", "100010"]
+    assert [item.value.notes.parts[0].bits() for item in complements.items] == ["001011", "1000", "100101"]
+    assert [item.value for item in densities.items] == [0.5, 0.75, 0.5]
+    # the results are rhythms like the others
+    assert union == ltv_eval('perc1"B/B/B/B/ z/z/"').value
+    # the rhythms are put on the finest grid, an event starts wherever one starts in one of them
+    assert ltv_eval('union(perc1"B z/ B/ B", perc1"B B B")').value == ltv_eval('perc1"B B/B/ B"').value
+    assert ltv_eval('intersection(perc1"B z/ B/ B", perc1"B B B")').value == ltv_eval('perc1"B z/z/ B"').value
+    assert ltv_eval('complement(perc1"B z/ B/ B")').value == ltv_eval('perc1"z B/z/ z"').value
+    assert ltv_eval('density(perc1"B z/ B/ B")') == mk_val(0.75)
+    with pytest.raises(Exception, match="ties"):
+        ltv_eval('union(perc1"B- B", perc1"B B")')
+
+def test_metrics():
+    result = ltv_eval(
+        """
+seq = stack(abc"c/d/e", abc"G,2 [ce] z")
+metrics = [notes_per_part(seq), count_parts(seq), duration(seq), pitch_range(seq)]
+seq->transpose(2)
+[metrics, pitch_range(seq), pitch_range(abc"z")]
+"""
+    ).value
+    metrics, transposed, rests = [item.value for item in result.items]
+    per_part, parts, length, pitches = [item.value for item in metrics.items]
+    assert [item.value for item in per_part.items] == [3, 2] and parts == 2 and length == 4
+    assert [item.value for item in pitches.items] == [55, 76]
+    # the side effect changed the metrics
+    assert [item.value for item in transposed.items] == [57, 78]
+    assert [item.value for item in rests.items] == [None, None]
+
+def test_incremental(capsys):
+    interpreter.evaluate_program("a = 1\nprint(a)\nb = 2\nprint(b)\n", incremental=True)
+    assert capsys.readouterr().out == "1\n2\n"
+    # only the statements downstream of the change are executed again
+    interpreter.evaluate_program("a = 1\nprint(a)\nb = 3\nprint(b)\n", incremental=True)
+    assert capsys.readouterr().out == "3\n"
+
+def test_incremental_displays_in_functions():
+    # the display runs on a line of the function, the statement calling it can't restore it from the cache
+    for i in range(3):
+        interpreter.evaluate_program('show = fn(p) {\n!p\n}\na = abc"cde"\nshow(a)\n', incremental=True)
+        assert len(interpreter.images) == 1
+
+def test_incremental_aliases(capsys):
+    program = 'a = abc"cde"\nb = a\na->shift({})\nprint(b == abc"cde".shift({}))\n'
+    interpreter.evaluate_program(program.format(1, 1), incremental=True)
+    # b is a, the statements using it run again when the side effect changes
+    interpreter.evaluate_program(program.format(2, 2), incremental=True)
+    assert capsys.readouterr().out == "True\nTrue\n"
+
+def test_incremental_list_aliases():
+    # the side effect goes through a list element, to a pattern that is also in a variable
+    for program in ['x = [abc"cdefg"]\nx[0]->shift({})\nx[0]\n', 'x = abc"cdefg"\ny = [x]\ny[0]->shift({})\nx\n']:
+        interpreter.evaluate_program(program.format(1), incremental=True)
+        assert interpreter.evaluate_program(program.format(2), incremental=True).value == ltv_eval('abc"fgcde"').value
+
+def test_lazy_abc(tmp_path, monkeypatch):
+    monkeypatch.setattr(ltv_render, "cache_folder", str(tmp_path))
+    seq = ltv_eval('abc"cde".transpose(2).shift(1)').value
+    # nothing touches the disk until the abc is needed
+    assert os.listdir(tmp_path) == []
+    assert seq.get_abc().split() == ["^f", "d", "e", "|", "%1"]
+
+def test_native_backend(monkeypatch):
+    program = 'abc"^c d _e [ce] z".transpose(6).shift(2)'
+    native = ltv_eval(program).value
+    assert native.notes is not None
+    monkeypatch.setattr(ltv_builtins, "native_backend", False)
+    m21 = ltv_eval(program).value
+    assert m21.notes is None
+    assert native.count_notes() == m21.count_notes()
+    assert [str(p) for p in native.m21_repr.flat.pitches] == [str(p) for p in m21.m21_repr.flat.pitches]
+
+def test_transpose_spelling(monkeypatch):
+    # a note transposed by semitones is spelled the way music21 spells it in the key it ends up in
+    programs = [f'abc"[K:{key}] c ^b _d ^f [ce^g] _a [K:Gb] ^c _e".transpose({semitones})'
+                for key, semitones in (("A", 9), ("Eb", 3), ("Bbm", -5), ("C#", 4))]
+    native = [[str(p) for p in ltv_eval(program).value.m21_repr.flat.pitches] for program in programs]
+    assert native[0][:2] == ["A#5", "A6"] and native[1][:2] == ["D#5", "D#6"]
+    monkeypatch.setattr(ltv_builtins, "native_backend", False)
+    assert native == [[str(p) for p in ltv_eval(program).value.m21_repr.flat.pitches] for program in programs]
+
+def test_abc_parser(monkeypatch):
+    program = 'abc"[M:3/4] (3c>de [K:D] ^c-|c [c_e] z/z/ |: f2 z :|"'
+    direct = ltv_eval(program).value
+    # what abc2xml makes of the same literal
+    monkeypatch.setattr(ltv_abc, "parse", lambda abcstring: None)
+    monkeypatch.setattr(ltv_builtins, "literal_cache", {})
+    converted = ltv_eval(program).value
+    assert [list(part.events()) for part in direct.notes.parts] == [list(part.events()) for part in converted.notes.parts]
+    assert [[(position, str(attribute)) for position, attribute in part.attributes] for part in direct.notes.parts] == \
+        [[(position, str(attribute)) for position, attribute in part.attributes] for part in converted.notes.parts]
+    assert ltv_abc.parse("c {g}d") is None
+
+def test_bar_lines(monkeypatch):
+    # the measures are the ones written in the literal, a pickup or a short last measure isn't filled with rests
+    program = 'abc"c d | e f g a | b"'
+    assert ltv_eval(program).value.get_abc().split() == ["c", "d", "|", "e", "f", "g", "a", "|", "b", "|", "%3"]
+    assert ltv_eval('concat(abc"c d | e f g a |", abc"b")').value.get_abc().split()[:9] == \
+        ["c", "d", "|", "e", "f", "g", "a", "|[K:C][M:4/4]", "b"]
+    monkeypatch.setattr(ltv_abc, "parse", lambda abcstring: None)
+    monkeypatch.setattr(ltv_builtins, "literal_cache", {})
+    assert ltv_eval(program).value.get_abc().split()[:8] == ["c", "d", "|", "e", "f", "g", "a", "|"]
+
+def test_display_keys():
+    # the key of the first measure is written in the displayed tune, which is drawn under the K:C of the header
+    for program, pitches in [('abc"[K:D] f g a b"', ["F#5", "G5", "A5", "B5"]),
+                             ('concat(abc"[K:D] c d", abc"[K:F] b c")', ["C#5", "D5", "B-5", "C5"])]:
+        abc = ltv_eval(program).value.get_abc()
+        assert [str(p) for p in ltv_eval(f'abc"""{abc}"""').value.m21_repr.flat.pitches] == pitches
+
+def test_chords():
+    # two notes on the same step are both kept
+    assert ltv_abc.parse("[c^c]") is None and ltv_abc.parse("[cc]") is None
+    chords = ltv_eval('abc"[c^c] [=cc] [ce]"').value
+    assert [[str(pitch) for pitch in chord.pitches] for chord in chords.m21_repr.flat.notes] == \
+        [["C5", "C#5"], ["C5", "C5"], ["C5", "E5"]]
+
+def test_converters(monkeypatch):
+    # the scripts give what the modules give (with a newline at the end), also when the module fails
+    abc = "X:1\nL:1/4\nK:C\n^c d [ce] z | (3efg a2 |]\n"
+    xml = ltv_builtins.abc_to_xml(abc)
+    abcstring = ltv_builtins.xml_to_abc(xml)
+    monkeypatch.setattr(ltv_builtins.abc2xml, "getXmlScores", lambda abcstring: 1 / 0)
+    assert ltv_builtins.abc_to_xml(abc).rstrip("\n") == xml
+    monkeypatch.setattr(ltv_builtins, "abc2xml", None)
+    monkeypatch.setattr(ltv_builtins, "xml2abc", None)
+    assert ltv_builtins.abc_to_xml(abc).rstrip("\n") == xml
+    assert ltv_builtins.xml_to_abc(xml) == abcstring
+
+def test_m21_shift(monkeypatch):
+    program = 'abc"|: B/2B/2 z/2 [ce] ^c d :|".shift(3).shift(-1)'
+    native = ltv_eval(program).value
+    monkeypatch.setattr(ltv_builtins, "native_backend", False)
+    m21 = ltv_eval(program).value
+    assert [("rest" if el.isRest else str(el.pitches), el.quarterLength) for el in native.m21_repr.flat.notesAndRests] == \
+        [("rest" if el.isRest else str(el.pitches), el.quarterLength) for el in m21.m21_repr.flat.notesAndRests]
+
+def test_m21_sharing(monkeypatch):
+    monkeypatch.setattr(ltv_builtins, "native_backend", False)
+    result = ltv_eval('a = abc"c d |1 e :|2 f |]"\nb = abc"g"\n[a, concat(a, b, a), stack(a, b)]').value
+    a, concatenated, stacked = [item.value for item in result.items]
+    measures = list(m21_helpers.getParts(a.m21_repr)[0].getElementsByClass("Measure"))
+    concatenated_measures = list(m21_helpers.getParts(concatenated.m21_repr)[0].getElementsByClass("Measure"))
+    # the elements are shared, only the ones of the second a are copied
+    assert concatenated_measures[:3] == measures and len(concatenated_measures) == 7
+    assert not any(measure in measures for measure in concatenated_measures[4:])
+    assert list(m21_helpers.getParts(stacked.m21_repr)[0].getElementsByClass("Measure")) == measures
+    assert [el.name for el in concatenated.m21_repr.flat.notes] == ["C", "D", "E", "F", "G", "C", "D", "E", "F"]
+
+def test_class_index():
+    part = music21.stream.Part([music21.note.Note("C"), music21.stream.Measure([music21.note.Rest()])])
+    assert [el.name for el in m21_helpers.findByClass(part, ("Note", "Rest"))] == ["C", "rest"]
+    assert m21_helpers.index(part) is m21_helpers.index(part)
+    # changing a measure inside the part rebuilds its index
+    part.getElementsByClass("Measure")[0].append(music21.note.Note("D"))
+    assert [el.name for el in m21_helpers.findByClass(part, "Note")] == ["C", "D"]
+
+def test_render_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ltv_render, "cache_folder", str(tmp_path))
+    seq = ltv_eval('abc"cde"').value
+    svg = ltv_render.svg_path(*seq.tune())
+    open(svg, "w").write("<svg/>")
+    # a cached image doesn't run abcm2ps
+    monkeypatch.setattr(ltv_render, "run", None)
+    assert seq.generate_image() == svg
+    # the least recently used files go first when the cache is too big
+    for i, name in enumerate(["old.svg", "new.svg"]):
+        open(tmp_path / name, "w").write("x" * 100)
+        os.utime(tmp_path / name, (i, i))
+    monkeypatch.setattr(ltv_render, "cache_size", 150)
+    ltv_render.evict()
+    assert sorted(os.listdir(tmp_path)) == sorted(["new.svg", os.path.basename(svg)])
+
+def fake_abcm2ps(calls, fails=None):
+    """writes an empty svg for each tune of the file like abcm2ps -g does, except for the tunes containing <fails>"""
+    def run(command, **kwargs):
+        calls.append(open(command[2]).read())
+        for i, tune in enumerate(calls[-1].split("X:")[1:]):
+            if fails is None or fails not in tune:
+                open(f"{command[4][:-len('.svg')]}{i+1:03d}.svg", "w").write("<svg/>")
+        return subprocess.CompletedProcess(command, 0, "", "error" if fails else "")
+    return run
+
+def test_displays(tmp_path, monkeypatch):
+    monkeypatch.setattr(ltv_render, "cache_folder", str(tmp_path / "cache"))
+    calls = []
+    monkeypatch.setattr(ltv_render, "run", fake_abcm2ps(calls))
+    program = 'a = abc"cde"\n!a\n!a.shift(1)\n!perc1"B B"\n!a\n'
+    open(tmp_path / "prog.ltv", "w").write(program)
+    lines, images = interpreter.evaluate_file(str(tmp_path / "prog.ltv"))
+    # every tune is rendered once, the ones with the same pre header share an abcm2ps run
+    assert sorted(abc.count("X:") for abc in calls) == [1, 2]
+    assert images[0] == images[3] and len(set(images)) == 3
+    assert all(os.path.exists(image) for image in images)
+    assert lines[1] == "!a " + images[0]
+    calls.clear()
+    interpreter.evaluate_file(str(tmp_path / "prog.ltv"))
+    assert calls == []
+
+def test_render_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(ltv_render, "cache_folder", str(tmp_path))
+    monkeypatch.setattr(ltv_render, "run", fake_abcm2ps([], fails="clef=perc"))
+    assert ltv_eval('!abc"cde"\n!perc1"B B"\n1').value == 1
+    assert len(interpreter.render_failures) == 1
+    assert interpreter.images[0] not in [svg for svg, error in interpreter.render_failures]
+    assert os.path.exists(interpreter.images[0])
+    # the batches of tunes are rendered while the program runs, an error is reported with the tunes it didn't render
+    def fail(pre_header, batch):
+        raise OSError("no space left")
+    monkeypatch.setattr(ltv_render, "run_abcm2ps", fail)
+    monkeypatch.setattr(ltv_render, "batch_size", 2)
+    program = "".join(f'!abc"{note}"\n' for note in "fgab") + "1"
+    assert ltv_eval(program).value == 1
+    assert [error for svg, error in interpreter.render_failures] == ["no space left"] * 4
+    assert interpreter.render_pool.rendering == set()
+
+def test_grammar():
+    assert ltv_eval("a = 4\n\n  # comment\nb = [1,\n  a // 3\n]\nb[1] / 2 # half\n") == mk_val(0.5)
+    # a path after a display is only recognized after a space
+    tree = interpreter.parser.parse('!a.shift(1) /tmp/x.svg\n!a / 2\n')
+    assert [len(display.children) for display in tree.children] == [2, 1]
+    # an elif or an else can start a new line
+    assert ltv_eval("a = 1\nif a == 2 {\n  a = 3\n}\nelif a == 4 {\n  a = 5\n}\n\nelse {\n  a = 6\n}\na\n") == mk_val(6)
+    assert ltv_eval("if 1 {\n  a = 3\n}\nelsewhere = 2\nelsewhere\n") == mk_val(2)
+    # a list or a call can end with a comma
+    assert [item.value for item in ltv_eval("a = [1,\n  2,]\na\n").value.items] == [mk_val(1).value, mk_val(2).value]
+    assert ltv_eval("f = fn(x,) {\n  x + 1\n}\nf(1,\n)\n") == mk_val(2)
@@ -16,6 +16,7 @@ See the Lesser GNU General Public License for more details. <http://www.gnu.org/
 try:    import xml.etree.cElementTree as E
 except: import xml.etree.ElementTree as E
 import os, sys, types, re, math
+from io import StringIO, BytesIO
 
 VERSION = 142
 
@@ -1511,10 +1512,8 @@ class Parser:
 #----------------
 # Main Program
 #----------------
-if __name__ == '__main__':
+def getOptionParser ():
     from optparse import OptionParser
-    from glob import glob
-    from zipfile import ZipFile 
     ustr = '%prog [-h] [-u] [-m] [-c C] [-d D] [-n CPL] [-b BPL] [-o DIR] [-v V]\n'
     ustr += '[-x] [-p PFMT] [-t] [-s] [-i] [--v1] [--noped] [--stems] <file1> [<file2> ...]'
     parser = OptionParser (usage=ustr, version=str(VERSION))
@@ -1535,6 +1534,23 @@ if __name__ == '__main__':
     parser.add_option ("--noped", action="store_false", help="skip all pedal directions", dest='ped', default=True)
     parser.add_option ("--stems", action="store_true", help="translate stem directions", dest='stm', default=False)
     parser.add_option ("-i", action="store_true", help="read xml file from standard input")
+    return parser
+
+def getAbcString (xml_string, args=[]):    # convert a musicXML string to an ABC string, args are command line options
+    global abcOut
+    options, _ = getOptionParser ().parse_args (args)
+    options.p = options.p and options.p.split (',') or []
+    abcOut = ABCoutput ('string.abc', '', 0, options)
+    abcOut.outfile = StringIO ()
+    if type (xml_string) == str: xml_string = xml_string.encode ('utf-8')
+    psr = Parser (options)
+    psr.parse (BytesIO (xml_string))
+    return abcOut.outfile.getvalue ()
+
+if __name__ == '__main__':
+    from glob import glob
+    from zipfile import ZipFile 
+    parser = getOptionParser ()
     options, args = parser.parse_args ()
     if options.n < 0: parser.error ('only values >= 0')
     if options.b < 0: parser.error ('only values >= 0')